@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Detection Pipeline Benchmark for Popmart Monitor
+Offline latency, throughput, memory and correctness checks over saved page fixtures
+"""
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(BENCH_DIR, 'fixtures')
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+# Configure logging before bot's setup_logging so the monitor neither writes its log file nor
+# spends the measured time formatting INFO lines
+logging.basicConfig(level=logging.WARNING, format='%(levelname)s - %(message)s')
+
+from bot import PopmartMonitor, parse_page  # noqa: E402
+
+
+def load_fixtures():
+    """Read the fixture manifest and the raw bytes of every fixture page"""
+    with open(os.path.join(FIXTURES_DIR, 'manifest.json'), 'r') as f:
+        manifest = json.load(f)
+
+    fixtures = []
+    for name, entry in manifest['fixtures'].items():
+        with open(os.path.join(FIXTURES_DIR, name), 'rb') as f:
+            raw = f.read()
+        fixtures.append({
+            'name': name,
+            'raw': raw,
+            'html': raw.decode('utf-8', errors='replace'),
+            'expect': entry['expect']
+        })
+    return manifest['url'], fixtures
+
+
+def create_monitor(workdir):
+    """Build a monitor with an offline config whose state lives in a scratch directory"""
+    config_file = os.path.join(workdir, 'config.json')
+    with open(config_file, 'w') as f:
+        json.dump({
+            'discord_webhook_url': '',
+            'products': [],
+            'monitoring': {'state_file': os.path.join(workdir, 'state.db')},
+            'parsing': {'process_pool': False}
+        }, f)
+    return PopmartMonitor(config_file)
+
+
+def benchmark_functions(monitor, url):
+    """The detection entry points under test, each taking (raw bytes, decoded html)"""
+    return [
+        ('classify', lambda raw, html: monitor.classifier.classify(raw)),
+        ('content_check', lambda raw, html: monitor.is_valid_content(monitor.classifier.classify(raw))),
+        ('is_login_required', lambda raw, html: monitor.is_login_required(html)),
+        ('extract_product_info', lambda raw, html: monitor.extract_product_info(html, url)),
+        ('parse_page', lambda raw, html: parse_page(raw, url, monitor.classifier.classify(raw))),
+    ]
+
+
+def observe(monitor, url, fixture):
+    """Run the pipeline once on a fixture and collect every value the manifest can assert"""
+    page = monitor.classifier.classify(fixture['raw'])
+    result = parse_page(fixture['raw'], url, page)
+    return {
+        'page_type': page.page_type,
+        'valid_content': monitor.is_valid_content(page),
+        'login_required': monitor.is_login_required(fixture['html']),
+        'source': result['source'],
+        'in_stock': result['product_info'].in_stock,
+        'html_in_stock': monitor.extract_product_info(fixture['html'], url).in_stock,
+        'price': result['product_info'].price,
+    }
+
+
+def measure(function, fixtures, iterations, warmup):
+    """Latency samples per call, total pages per second and tracemalloc peak for one function"""
+    for fixture in fixtures:
+        for _ in range(warmup):
+            function(fixture['raw'], fixture['html'])
+
+    samples = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for fixture in fixtures:
+            call_start = time.perf_counter()
+            function(fixture['raw'], fixture['html'])
+            samples.append(time.perf_counter() - call_start)
+    elapsed = time.perf_counter() - started
+
+    # Peak memory is measured on a separate pass so tracing overhead stays out of the timings
+    tracemalloc.start()
+    peak = 0
+    for fixture in fixtures:
+        tracemalloc.reset_peak()
+        function(fixture['raw'], fixture['html'])
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+    tracemalloc.stop()
+
+    samples.sort()
+    return {
+        'median_ms': statistics.median(samples) * 1000,
+        'p95_ms': samples[min(int(len(samples) * 0.95), len(samples) - 1)] * 1000,
+        'pages_per_second': len(samples) / elapsed if elapsed else 0.0,
+        'peak_kib': peak / 1024,
+    }
+
+
+def correctness_matrix(monitor, url, fixtures):
+    """Compare observed values with the manifest; returns (rows, failure count)"""
+    rows = []
+    failures = 0
+    for fixture in fixtures:
+        observed = observe(monitor, url, fixture)
+        cells = {}
+        for key, expected in fixture['expect'].items():
+            ok = observed[key] == expected
+            failures += not ok
+            cells[key] = {'ok': ok, 'expected': expected, 'observed': observed[key]}
+        rows.append((fixture['name'], cells))
+    return rows, failures
+
+
+def compare_baseline(results, baseline_file, max_regression):
+    """Return the functions whose median latency regressed beyond the allowed ratio"""
+    with open(baseline_file, 'r') as f:
+        baseline = json.load(f)['timings']
+
+    regressions = []
+    for name, timing in results.items():
+        before = baseline.get(name)
+        if before and timing['median_ms'] > before['median_ms'] * (1 + max_regression):
+            regressions.append((name, before['median_ms'], timing['median_ms']))
+    return regressions
+
+
+def print_report(timings, rows, fixtures, regressions):
+    """Print the latency table and correctness matrix"""
+    total_kib = sum(len(fixture['raw']) for fixture in fixtures) / 1024
+    print("📊 DETECTION BENCHMARK")
+    print("=" * 72)
+    print(f"Fixtures: {len(fixtures)} pages, {total_kib:.0f} KiB")
+    print()
+    print(f"{'Function':<22}{'median ms':>11}{'p95 ms':>10}{'pages/s':>11}{'peak KiB':>11}")
+    print("-" * 72)
+    for name, timing in timings.items():
+        print(f"{name:<22}{timing['median_ms']:>11.3f}{timing['p95_ms']:>10.3f}"
+              f"{timing['pages_per_second']:>11.0f}{timing['peak_kib']:>11.0f}")
+    if resource:
+        # ru_maxrss is KiB on Linux; it also covers lxml's C allocations that tracemalloc misses
+        print(f"Process peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MiB")
+
+    columns = []
+    for _, cells in rows:
+        columns.extend(key for key in cells if key not in columns)
+
+    print()
+    print("🧪 CORRECTNESS MATRIX")
+    print("=" * 72)
+    print(f"{'Fixture':<30}" + ''.join(f"{column[:13]:>14}" for column in columns))
+    for name, cells in rows:
+        marks = ''.join(f"{('✅' if cells[column]['ok'] else '❌') if column in cells else '-':>14}"
+                        for column in columns)
+        print(f"{name:<30}{marks}")
+    for name, cells in rows:
+        for column, cell in cells.items():
+            if not cell['ok']:
+                print(f"   ❌ {name} {column}: expected {cell['expected']!r}, got {cell['observed']!r}")
+
+    for name, before, after in regressions:
+        print(f"   🐢 {name}: median {before:.3f}ms -> {after:.3f}ms")
+
+
+def main():
+    """Run the benchmark and exit non-zero on a correctness failure or latency regression"""
+    parser = argparse.ArgumentParser(description="Benchmark the Popmart Monitor detection pipeline")
+    parser.add_argument('--iterations', type=int, default=50, help="Timed passes over the fixture corpus")
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--only', action='append', metavar='FUNCTION', help="Benchmark only these functions")
+    parser.add_argument('--save', metavar='FILE', help="Write results as JSON, e.g. to use as a baseline")
+    parser.add_argument('--baseline', metavar='FILE', help="Fail if a median is slower than in this result file")
+    parser.add_argument('--max-regression', type=float, default=0.25,
+                        help="Allowed median slowdown against the baseline (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    url, fixtures = load_fixtures()
+    with tempfile.TemporaryDirectory() as workdir:
+        monitor = create_monitor(workdir)
+        try:
+            timings = {}
+            for name, function in benchmark_functions(monitor, url):
+                if args.only and name not in args.only:
+                    continue
+                timings[name] = measure(function, fixtures, args.iterations, args.warmup)
+            rows, failures = correctness_matrix(monitor, url, fixtures)
+        finally:
+            monitor.cleanup()
+
+    regressions = compare_baseline(timings, args.baseline, args.max_regression) if args.baseline else []
+    print_report(timings, rows, fixtures, regressions)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'timings': timings, 'correctness_failures': failures}, f, indent=4)
+
+    if failures or regressions:
+        print(f"\n❌ {failures} correctness failures, {len(regressions)} latency regressions")
+        sys.exit(1)
+    print("\n✅ All fixtures detected correctly")
+
+
+if __name__ == "__main__":
+    main()
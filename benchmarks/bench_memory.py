@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Data Model Memory Benchmark for Popmart Monitor
+Compares the memory held by product definitions, check results and product state as plain
+dicts with the slotted records, at a configurable number of products and check history depth
+"""
+
+import argparse
+import gc
+import json
+import logging
+import os
+import sys
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+logging.basicConfig(level=logging.WARNING, format='%(levelname)s - %(message)s')
+
+from bot import ProductInfo, ProductState, load_products  # noqa: E402
+
+
+def config_text(products):
+    """config['products'] as it would be read from config.json"""
+    return json.dumps([
+        {'name': f"THE MONSTERS Collection Figure {i}",
+         'url': f"https://www.popmart.com/us/products/{i}/THE-MONSTERS-Collection-Figure-{i}",
+         **({'interval_minutes': 1} if i % 10 == 0 else {})}
+        for i in range(products)
+    ])
+
+
+def parsed_fields(entry, check):
+    """Fresh strings for one check, as a parse of the fetched page produces them"""
+    url = entry['url']
+    return {
+        'name': ' '.join(entry['name'].split(' ')),
+        'price': f"${19 + check % 3}.99",
+        'in_stock': check % 2 == 1,
+        'image_url': f"https://prod-eurasian-res.popmart.com/default/{url.split('/')[5]}_800x800.jpg",
+        'direct_buy_url': ''.join(url.partition('/us/')),
+    }
+
+
+def dict_products(text):
+    """Product definitions as the config dicts"""
+    return json.loads(text)
+
+
+def record_products(text):
+    """Product definitions as Product records"""
+    return load_products(json.loads(text))
+
+
+def dict_results(entries, history):
+    """Recent check results per product as dicts"""
+    return {entry['url']: [dict(parsed_fields(entry, check)) for check in range(history)]
+            for entry in entries}
+
+
+def record_results(entries, history):
+    """Recent check results per product as ProductInfo records"""
+    return {entry['url']: [ProductInfo(**parsed_fields(entry, check)) for check in range(history)]
+            for entry in entries}
+
+
+def state_fields(entry, now):
+    """Fields of a stored product state"""
+    fields = parsed_fields(entry, 1)
+    return {
+        'url': ''.join(entry['url'].partition('/us/')),
+        'name': fields['name'],
+        'in_stock': fields['in_stock'],
+        'price': fields['price'],
+        'image_url': fields['image_url'],
+        'fingerprint': f"{hash(entry['url']) & (2 ** 128 - 1):032x}",
+        'last_seen': now,
+        'last_change': now - 60,
+        'checks': 100,
+        'failures': 2,
+    }
+
+
+def dict_states(entries):
+    """Per-product runtime state as dicts, the shape ProductStateStore kept"""
+    now = time.time()
+    return {entry['url']: state_fields(entry, now) for entry in entries}
+
+
+def record_states(entries):
+    """Per-product runtime state as ProductState records"""
+    now = time.time()
+    return {entry['url']: ProductState(**state_fields(entry, now)) for entry in entries}
+
+
+def measure(parts):
+    """Bytes each part adds while the earlier parts stay alive, as they do in the running monitor"""
+    gc.collect()
+    tracemalloc.start()
+    kept = []
+    sizes = {}
+    for name, build in parts:
+        before = tracemalloc.get_traced_memory()[0]
+        kept.append(build())
+        gc.collect()
+        sizes[name] = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return sizes
+
+
+def print_report(rows, products, history):
+    """Print one row per part of the data model"""
+    print("🧠 DATA MODEL MEMORY")
+    print("=" * 78)
+    print(f"{products} products, {history} check results kept per product")
+    print()
+    print(f"{'Part':<18}{'dict MiB':>11}{'slotted MiB':>13}{'dict B/prod':>13}{'slotted B/prod':>16}{'saved':>7}")
+    print("-" * 78)
+    for name, (before, after) in rows.items():
+        saved = 1 - after / before if before else 0.0
+        print(f"{name:<18}{before / 2 ** 20:>11.2f}{after / 2 ** 20:>13.2f}"
+              f"{before / products:>13.0f}{after / products:>16.0f}{saved:>7.0%}")
+    print("Interned URLs and names are charged to the products row; the later parts share them")
+
+
+def main():
+    """Measure both data models and optionally save the numbers"""
+    parser = argparse.ArgumentParser(description="Compare dict and slotted data model memory")
+    parser.add_argument('--products', type=int, default=10000)
+    parser.add_argument('--history', type=int, default=10, help="Check results kept in memory per product")
+    parser.add_argument('--save', metavar='FILE', help="Write results as JSON")
+    args = parser.parse_args()
+
+    text = config_text(args.products)
+    entries = json.loads(text)
+    before = measure([
+        ('products', lambda: dict_products(text)),
+        ('check results', lambda: dict_results(entries, args.history)),
+        ('product state', lambda: dict_states(entries)),
+    ])
+    after = measure([
+        ('products', lambda: record_products(text)),
+        ('check results', lambda: record_results(entries, args.history)),
+        ('product state', lambda: record_states(entries)),
+    ])
+    rows = {name: (before[name], after[name]) for name in before}
+    rows['total'] = (sum(before.values()), sum(after.values()))
+
+    print_report(rows, args.products, args.history)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({name: {'dict_bytes': before, 'slotted_bytes': after}
+                       for name, (before, after) in rows.items()}, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,36 +6,2312 @@ Advanced monitoring script with Cloudflare bypass and Discord notifications
 
 import json
 import time
+import asyncio
 import random
 import logging
 import requests
 import cloudscraper
-from bs4 import BeautifulSoup
+import lxml.html
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.action_chains import ActionChains
-from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.common.exceptions import JavascriptException, TimeoutException
 import undetected_chromedriver as uc
-from discord_webhook import DiscordWebhook, DiscordEmbed
-import schedule
-from datetime import datetime
+from datetime import datetime, timezone
 import sys
 import os
+import re
+import html
+import codecs
+import hashlib
+import sqlite3
+import queue
+import heapq
+import itertools
+import bisect
+import functools
+import signal
+import tracemalloc
+from collections import Counter, deque
 import threading
+from contextlib import contextmanager
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from fake_useragent import UserAgent
 
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+# Streaming stock detection: once the action container has been seen, the
+# notify button text is a decisive out-of-stock marker
+STREAM_CHUNK_SIZE = 16384
+STREAM_CONTAINER_MARKER = 'index_actioncontainer__eqfye'
+STREAM_OUT_OF_STOCK_MARKER = 'notify me when available'
+STREAM_CHALLENGE_MARKERS = ('cf-browser-verification', 'checking your browser')
+
+TITLE_PATTERN = re.compile(r'<title[^>]*>(.*?)</title>', re.IGNORECASE | re.DOTALL)
+
+# Embedded page data: Next.js page props and schema.org JSON-LD blocks
+NEXT_DATA_PATTERN = re.compile(rb'<script[^>]*\bid=["\']__NEXT_DATA__["\'][^>]*>(.*?)</script>', re.DOTALL)
+JSON_LD_PATTERN = re.compile(rb'<script[^>]*application/ld\+json[^>]*>(.*?)</script>', re.DOTALL | re.IGNORECASE)
+SKU_STOCK_KEYS = ('onlineStock', 'stock', 'availableStock', 'inventory', 'quantity')
+SKU_AVAILABLE_KEYS = ('inStock', 'isInStock', 'available', 'isAvailable')
+SKU_SOLD_OUT_KEYS = ('soldOut', 'isSoldOut')
+
+# Listing pages: product IDs in product links and item records, and the stock badges on item cards
+PRODUCT_ID_PATTERN = re.compile(r'/products/(\d+)')
+LISTING_ID_KEYS = ('id', 'productId', 'spuId')
+LISTING_OUT_OF_STOCK_BADGES = ('sold out', 'out of stock', 'notify me')
+LISTING_IN_STOCK_BADGES = ('add to bag', 'buy now')
+
+# Content fingerprints cover the title, the first price and a window after the action container
+FINGERPRINT_TITLE_PATTERN = re.compile(rb'<title[^>]*>.*?</title>', re.IGNORECASE | re.DOTALL)
+FINGERPRINT_PRICE_PATTERN = re.compile(rb'\$[\d,]+\.?\d*|price["\s]*:[\s]*["\$]*[\d,]+\.?\d*', re.IGNORECASE)
+FINGERPRINT_CONTAINER_MARKER = b'index_actionContainer__EqFYe'
+FINGERPRINT_CONTAINER_WINDOW = 2048
+# Stock fields of embedded product data, so a restock that only shows there changes the fingerprint
+FINGERPRINT_STOCK_FIELD_PATTERN = re.compile(
+    rb'"(?:' + b'|'.join(re.escape(key.encode('ascii')) for key in
+                         SKU_STOCK_KEYS + SKU_AVAILABLE_KEYS + SKU_SOLD_OUT_KEYS + ('availability',))
+    + rb')"\s*:\s*(?:\{[^{}]*\}|"[^"]*"|[^,}\]]*)'
+)
+PRICE_PATTERNS = [
+    re.compile(r'\$[\d,]+\.?\d*', re.IGNORECASE),
+    re.compile(r'price["\s]*:[\s]*["\$]*([\d,]+\.?\d*)', re.IGNORECASE),
+]
+
+# Selenium resource blocking. Network.setBlockedURLs matches URL patterns only, so
+# resource types are expressed as file-extension patterns
+RESOURCE_TYPE_PATTERNS = {
+    'image': ['*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.avif', '*.svg', '*.ico', '*.bmp'],
+    'font': ['*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot'],
+    'media': ['*.mp4', '*.webm', '*.mp3', '*.m3u8', '*.ogg', '*.mov'],
+    'stylesheet': ['*.css'],
+}
+DEFAULT_BLOCKED_RESOURCE_TYPES = ['image', 'font', 'media']
+DEFAULT_BLOCKED_URL_PATTERNS = [
+    '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*', '*facebook.net*',
+    '*connect.facebook.com*', '*hotjar.com*', '*clarity.ms*', '*tiktok.com*', '*criteo.*',
+    '*pinterest.com*', '*snapchat.com*', '*bing.com/bat*', '*sentry.io*'
+]
+
+# Injected into Selenium pages: resolves as soon as a decisive element appears. Mutations
+# are debounced so the probe (which reads a bounded text prefix) runs at most every 100 ms
+PAGE_STATE_SCRIPT = """
+var done = arguments[arguments.length - 1];
+var sliceMs = arguments[0];
+var finished = false;
+var pending = null;
+
+function probe() {
+    if (document.querySelector('.index_actionContainer__EqFYe, .index_red__kx6Ql, .index_black__RgEgP')) {
+        return 'product';
+    }
+    var text = (document.title + ' ' +
+                (document.body ? document.body.textContent.slice(0, 4000) : '')).toLowerCase();
+    if (/cf-browser-verification|checking your browser|please wait|ddos protection|security check/.test(text)) {
+        return null;
+    }
+    if (document.getElementById('email') || document.getElementById('password')) {
+        return 'login';
+    }
+    if (/access denied|403 forbidden/.test(text)) {
+        return 'denied';
+    }
+    return null;
+}
+
+function finish(state) {
+    if (finished) { return; }
+    finished = true;
+    observer.disconnect();
+    done(state);
+}
+
+var observer = new MutationObserver(function () {
+    if (pending) { return; }
+    pending = setTimeout(function () {
+        pending = null;
+        var state = probe();
+        if (state) { finish(state); }
+    }, 100);
+});
+
+var initial = probe();
+if (initial) {
+    finished = true;
+    done(initial);
+} else {
+    observer.observe(document.documentElement, {childList: true, subtree: true, attributes: true,
+                                                attributeFilter: ['class', 'id']});
+    setTimeout(function () {
+        var text = document.body ? document.body.textContent.slice(0, 20000).toLowerCase() : '';
+        var loaded = document.readyState === 'complete' && /popmart|labubu/.test(text) &&
+                     !/checking your browser|cf-browser-verification/.test(text);
+        finish(loaded ? 'content' : null);
+    }, sliceMs);
+}
+"""
+
+# Page classifier markers by group. A marker can belong to several groups;
+# login markers are matched case-sensitively, everything else ignores case
+PAGE_MARKERS = {
+    'challenge': ['cf-browser-verification', 'checking your browser'],
+    'interstitial': ['please wait', 'ddos protection', 'security check'],
+    'brand': ['popmart', 'labubu'],
+    'content': ['popmart', 'labubu', 'add to bag', 'notify me when available'],
+    'out_of_stock': ['index_black__RgEgP', 'NOTIFY ME WHEN AVAILABLE', 'index_renderbtn__iGhhU',
+                     'index_actionContainer__EqFYe'],
+    'in_stock': ['index_red__kx6Ql', 'ADD TO BAG', 'ADD TO CART'],
+    # A bare '403' would also match prices, product IDs and image hashes on real pages
+    'denied': ['access denied', '403 forbidden'],
+    # A page cut off mid-transfer never reaches the closing tag
+    'complete': ['</html>'],
+    'login': [
+        # Email input page
+        'placeholder="Enter your e-mail address"',
+        'class="ant-input index_loginInput__HBgjq"',
+        'id="email"',
+        # Password input page
+        'placeholder="Enter your password"',
+        'id="password"',
+        'class="index_disabledEmail__sdPjU"',
+        # Login form
+        'class="ant-form ant-form-horizontal index_loginForm__yLEpj"',
+        # Login buttons
+        'class="ant-btn ant-btn-primary index_loginButton__O6r8l"',
+        # Service agreement checkbox
+        'class="index_serviceCheck__D3US1"',
+        'class="ant-checkbox-wrapper index_serviceCheckbox__KjCpl"',
+        # Privacy policy popup
+        'class="policy_aboveFixedContainer__KfeZi"',
+        'class="policy_acceptBtn__ZNU71"',
+        # Location popup
+        'class="index_ipWarnContainer__d5qTd"',
+        'You are in the United States'
+    ],
+}
+CASE_SENSITIVE_GROUPS = ('login',)
+
+# Product page extraction, compiled once at import
+ACTION_CONTAINER_CLASS = 'index_actionContainer__EqFYe'
+PRICE_CLASS_PATTERN = re.compile(r'price|cost|amount')
+PRICE_TEXT_PATTERN = re.compile(r'\$[\d,]+\.?\d*')
+IMAGE_EXTENSIONS = ('jpg', 'png', 'webp', 'jpeg')
+HTML_PARSER = lxml.html.HTMLParser(encoding='utf-8', remove_comments=True)
+
+# Fetch strategies in their static fallback order, with the latency in seconds assumed
+# for each until real observations come in; the priors keep Selenium and plain
+# requests behind CloudScraper on a cold start
+FETCH_STRATEGIES = ('cloudscraper_linux', 'cloudscraper_windows', 'cloudscraper_darwin', 'selenium', 'requests')
+FETCH_STRATEGY_PRIORS = {
+    'cloudscraper_linux': 2.0,
+    'cloudscraper_windows': 2.5,
+    'cloudscraper_darwin': 3.0,
+    'selenium': 20.0,
+    'requests': 30.0,
+}
+
+# Largest capture POST /profile accepts
+MAX_PROFILE_CYCLES = 100
+
+# Metrics: histogram buckets in seconds, and the type and help text of every exported metric
+METRIC_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+METRIC_DEFINITIONS = {
+    'popmart_stage_seconds': ('histogram', 'Time spent in each stage of a product check'),
+    'popmart_span_seconds': ('histogram', 'Time spent in instrumented hot-path methods'),
+    'popmart_fetch_seconds': ('histogram', 'Duration of one fetch attempt per strategy'),
+    'popmart_fetch_attempts_total': ('counter', 'Fetch attempts per strategy and outcome'),
+    'popmart_product_check_seconds': ('histogram', 'Duration of a full check per product'),
+    'popmart_product_checks_total': ('counter', 'Completed checks per product and result'),
+    'popmart_notifications_total': ('counter', 'Stock notifications per outcome'),
+    'popmart_sessions_total': ('counter', 'HTTP sessions created or reused'),
+    'popmart_page_cache_total': ('counter', 'Conditional request cache lookups per result'),
+    'popmart_fingerprint_total': ('counter', 'Stock region fingerprint lookups per result'),
+    'popmart_rate_limited_requests_total': ('counter', 'Requests that passed through the host rate limiter'),
+    'popmart_dispatcher_queue_depth': ('gauge', 'Discord notifications waiting to be sent'),
+    'popmart_dispatcher_sent_total': ('counter', 'Discord embeds delivered'),
+    'popmart_dispatcher_failed_total': ('counter', 'Discord embeds that could not be delivered'),
+    'popmart_dispatcher_latency_seconds': ('gauge', 'Recent Discord webhook send latency'),
+    'popmart_scheduler_lateness_seconds': ('gauge', 'How late the last scheduler batch started'),
+    'popmart_scheduler_overruns_total': ('counter', 'Checks that finished after their next due time'),
+    'popmart_strategy_first_total': ('counter', 'Fetches that tried this strategy first'),
+    'popmart_strategy_rank': ('gauge', 'Current position of the strategy in the fetch order (0 = first)'),
+    'popmart_strategy_success_ratio': ('gauge', 'Rolling success rate of the strategy'),
+    'popmart_strategy_latency_seconds': ('gauge', 'Rolling average latency of the strategy'),
+    'popmart_strategy_cooldown_seconds': ('gauge', 'Seconds until a failing strategy is tried again'),
+    'popmart_config_reloads_total': ('counter', 'Config file reloads per result'),
+    'popmart_listing_fetches_total': ('counter', 'Listing page fetches per result'),
+    'popmart_listing_products_total': ('counter', 'Tracked products seen on listing pages per outcome'),
+}
+
+# Config reload: numeric settings with their lowest valid value, and settings that only
+# take effect after a restart because the resources they size are built once
+CONFIG_MINIMUMS = {
+    'monitoring.check_interval_minutes': 0.01,
+    'monitoring.max_check_interval_minutes': 0.01,
+    'monitoring.max_concurrent_checks': 1,
+    'monitoring.requests_per_minute_per_host': 0.1,
+    'monitoring.max_connections_per_host': 1,
+    'monitoring.session_idle_timeout_seconds': 0,
+    'monitoring.config_reload_seconds': 0,
+    'monitoring.request_budget.requests_per_minute': 0.1,
+    'monitoring.request_budget.min_interval_seconds': 0,
+    'cloudflare.max_retries': 1,
+    'cloudflare.retry_delay': 0,
+    'cloudflare.strategy_window': 1,
+    'cloudflare.strategy_failure_threshold': 1,
+    'cloudflare.strategy_cooldown_seconds': 0,
+    'notifications.max_queue': 1,
+    'notifications.batch_window_seconds': 0,
+    'metrics.port': 0,
+    'metrics.log_summary_minutes': 0,
+    'profiling.cycles': 1,
+    'profiling.sample_interval_ms': 0.1,
+    'parsing.workers': 1,
+    'parsing.max_pending': 1,
+    'parsing.min_page_bytes': 0,
+    'selenium.pool_size': 1,
+}
+RESTART_REQUIRED_SETTINGS = ('monitoring.state_file', 'selenium.pool_size', 'selenium.prewarm',
+                             'selenium.block_resources', 'selenium.block_resource_types',
+                             'selenium.block_url_patterns', 'profiling.signal', 'sharding')
+
+
+def settings_touched(changed, *keys):
+    """Whether any changed setting is one of the keys or nested under one of them"""
+    return any(key == prefix or key.startswith(prefix + '.') for key in changed for prefix in keys)
+
+
+def intern_text(value):
+    """Share one copy of strings that repeat across products, such as URLs, hosts and prices"""
+    return sys.intern(value) if type(value) is str else value
+
+
+class Record:
+    """Base for fixed-field records kept in __slots__ rather than a per-instance dict"""
+
+    __slots__ = ()
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(
+            getattr(self, field) == getattr(other, field) for field in self.__slots__)
+
+    __hash__ = None
+
+    def __repr__(self):
+        fields = ', '.join(f"{field}={getattr(self, field)!r}" for field in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+    def copy(self):
+        """Shallow copy of the record"""
+        clone = object.__new__(type(self))
+        for field in self.__slots__:
+            setattr(clone, field, getattr(self, field))
+        return clone
+
+    def to_dict(self):
+        """Fields as a plain dict"""
+        return {field: getattr(self, field) for field in self.__slots__}
+
+
+class Product(Record):
+    """A product definition from config['products']"""
+
+    __slots__ = ('name', 'url', 'host', 'interval_minutes', 'jitter_seconds', 'priority', 'options')
+
+    def __init__(self, name, url, interval_minutes=None, jitter_seconds=None, priority=1.0, options=None):
+        self.name = intern_text(name)
+        self.url = intern_text(url)
+        self.host = intern_text(urlparse(url).netloc)
+        self.interval_minutes = interval_minutes
+        self.jitter_seconds = jitter_seconds
+        self.priority = priority
+        # Config keys without a field of their own, kept so the entry round-trips
+        self.options = options or None
+
+    @classmethod
+    def from_config(cls, entry):
+        """Product from a config entry"""
+        entry = dict(entry)
+        return cls(entry.pop('name'), entry.pop('url'), entry.pop('interval_minutes', None),
+                   entry.pop('jitter_seconds', None), entry.pop('priority', 1.0), entry)
+
+    def to_config(self):
+        """Config entry for the product, leaving out unset fields"""
+        entry = {'name': self.name, 'url': self.url}
+        for field in ('interval_minutes', 'jitter_seconds'):
+            if getattr(self, field) is not None:
+                entry[field] = getattr(self, field)
+        if self.priority != 1.0:
+            entry['priority'] = self.priority
+        entry.update(self.options or {})
+        return entry
+
+
+class ProductInfo(Record):
+    """What one check found out about a product"""
+
+    __slots__ = ('name', 'price', 'in_stock', 'image_url', 'direct_buy_url')
+
+    def __init__(self, name='', price='', in_stock=False, image_url='', direct_buy_url=''):
+        self.name = intern_text(name)
+        self.price = intern_text(price)
+        self.in_stock = in_stock
+        self.image_url = image_url
+        self.direct_buy_url = intern_text(direct_buy_url)
+
+
+class ProductState(Record):
+    """Last known state of a product, as persisted by ProductStateStore"""
+
+    __slots__ = ('url', 'name', 'in_stock', 'price', 'image_url', 'fingerprint',
+                 'last_seen', 'last_change', 'checks', 'failures')
+
+    def __init__(self, url, name=None, in_stock=False, price=None, image_url=None, fingerprint=None,
+                 last_seen=None, last_change=None, checks=0, failures=0):
+        self.url = intern_text(url)
+        self.name = intern_text(name)
+        self.in_stock = bool(in_stock)
+        self.price = intern_text(price)
+        self.image_url = image_url
+        self.fingerprint = fingerprint
+        self.last_seen = last_seen
+        self.last_change = last_change
+        self.checks = checks
+        self.failures = failures
+
+
+def load_products(entries):
+    """Product records for config['products'] entries"""
+    return [entry if isinstance(entry, Product) else Product.from_config(entry) for entry in entries]
+
+
+def format_price(value, currency='USD'):
+    """Format an embedded price; integers are minor units (cents), as Popmart's page data uses"""
+    if isinstance(value, str):
+        value = value.strip()
+        if not value or value.startswith('$'):
+            return value
+        try:
+            value = float(value.replace(',', ''))
+        except ValueError:
+            return value
+    elif isinstance(value, int) and not isinstance(value, bool):
+        value = value / 100
+    elif not isinstance(value, float):
+        return ''
+    symbol = '$' if currency in (None, 'USD') else f"{currency} "
+    return f"{symbol}{value:,.2f}"
+
+
+def sku_in_stock(sku):
+    """Stock state of one SKU dict: True, False or None when it carries no stock data"""
+    for key in SKU_SOLD_OUT_KEYS:
+        if isinstance(sku.get(key), bool):
+            return not sku[key]
+    for key in SKU_AVAILABLE_KEYS:
+        if isinstance(sku.get(key), bool):
+            return sku[key]
+    for key in SKU_STOCK_KEYS:
+        stock = sku.get(key)
+        if isinstance(stock, dict):
+            stock = stock.get('onlineStock', stock.get('stock'))
+        if isinstance(stock, (int, float)) and not isinstance(stock, bool):
+            return stock > 0
+    return None
+
+
+def next_product_fields(node):
+    """Fields of a Next.js product record (a dict with a title and a list of SKUs), or None"""
+    skus = node.get('skus')
+    title = node.get('title') or node.get('name')
+    if not (isinstance(skus, list) and skus and isinstance(title, str)):
+        return None
+    
+    states = [sku_in_stock(sku) for sku in skus if isinstance(sku, dict)]
+    known = [state for state in states if state is not None]
+    first_sku = skus[0] if isinstance(skus[0], dict) else {}
+    price = first_sku.get('discountPrice') or first_sku.get('price') or node.get('price')
+
+    images = node.get('bannerImages') or node.get('images') or first_sku.get('mainImage') or ''
+    if isinstance(images, list):
+        images = images[0] if images else ''
+    if isinstance(images, dict):
+        images = images.get('url', '')
+
+    return {
+        'source': '__NEXT_DATA__',
+        'name': title.strip(),
+        'price': format_price(price, node.get('currency')),
+        'in_stock': any(known) if known else None,
+        'image_url': images if isinstance(images, str) else ''
+    }
+
+
+def node_product_id(node):
+    """Product ID of a Next.js record from its first ID-like key, as a string, or None"""
+    return next((str(node[key]) for key in LISTING_ID_KEYS
+                 if isinstance(node.get(key), (int, str)) and not isinstance(node[key], bool)), None)
+
+
+def find_next_product(data, wanted_id=None):
+    """Find the product record (a dict with a title and a list of SKUs) in Next.js page data
+
+    Related-product lists can come before the page's own record, so the record whose ID matches
+    wanted_id wins and the first record found is only the fallback.
+    """
+    first = None
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            product = next_product_fields(node)
+            if product is not None:
+                if wanted_id is None or node_product_id(node) == wanted_id:
+                    return product
+                if first is None:
+                    first = product
+            stack.extend(reversed(list(node.values())))
+        elif isinstance(node, list):
+            stack.extend(reversed(node))
+    return first
+
+
+def find_json_ld_product(data):
+    """Find a schema.org Product with offers in a JSON-LD block"""
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(reversed(node))
+            continue
+        if not isinstance(node, dict):
+            continue
+        if node.get('@type') != 'Product':
+            stack.extend(reversed(node.get('@graph', [])))
+            continue
+
+        offers = node.get('offers') or {}
+        offers = offers if isinstance(offers, list) else [offers]
+        states = []
+        for offer in offers:
+            availability = str(offer.get('availability', ''))
+            if availability.endswith(('InStock', 'LimitedAvailability', 'OnlineOnly')):
+                states.append(True)
+            elif availability.endswith(('OutOfStock', 'SoldOut', 'Discontinued', 'PreOrder')):
+                states.append(False)
+
+        first_offer = offers[0] if offers else {}
+        price = first_offer.get('price', '')
+        image = node.get('image') or ''
+        if isinstance(image, list):
+            image = image[0] if image else ''
+
+        return {
+            'source': 'JSON-LD',
+            'name': str(node.get('name', '')).strip(),
+            'price': format_price(str(price), first_offer.get('priceCurrency')) if price != '' else '',
+            'in_stock': any(states) if states else None,
+            'image_url': image if isinstance(image, str) else ''
+        }
+    return None
+
+
+def extract_embedded_product(raw_content, errors, wanted_id=None):
+    """Product data from __NEXT_DATA__ or JSON-LD in the raw page, or None if absent"""
+    product = None
+    
+    match = NEXT_DATA_PATTERN.search(raw_content)
+    if match:
+        try:
+            product = find_next_product(json_loads(match.group(1)), wanted_id)
+        except ValueError as e:
+            errors.append(f"Could not decode __NEXT_DATA__: {e}")
+    
+    if product is None:
+        for match in JSON_LD_PATTERN.finditer(raw_content):
+            try:
+                product = find_json_ld_product(json_loads(match.group(1)))
+            except ValueError:
+                continue
+            if product is not None:
+                break
+    
+    if product is None or product['in_stock'] is None:
+        return None
+    return product
+
+
+def extract_html_product(html_bytes, product_url, page, errors):
+    """Extract product information from HTML in a single pass over the lxml tree"""
+    name = ''
+    price = ''
+    in_stock = False
+    image_url = ''
+    
+    try:
+        html_content = html_bytes.decode('utf-8', errors='replace')
+        
+        # Enhanced stock status detection using exact HTML elements
+        # Out-of-stock markers (black button, notify text, action container) win over in-stock ones
+        if not page.has('out_of_stock'):
+            in_stock = page.has('in_stock')
+        
+        # Enhanced price extraction
+        for pattern in PRICE_PATTERNS:
+            price_match = pattern.search(html_content)
+            if price_match:
+                price = price_match.group(0)
+                break
+        
+        root = lxml.html.fromstring(html_bytes, parser=HTML_PARSER) if html_bytes.strip() else None
+        
+        title_found = False
+        large_image = ''
+        fallback_image = ''
+        action_container = None
+        price_elements = []
+        
+        # One walk collects the title, action container, price containers and product images
+        for element in (root.iter('title', 'div', 'span', 'img') if root is not None else ()):
+            tag = element.tag
+            
+            if tag == 'img':
+                if element.get('alt') != 'POP MART':
+                    continue
+                src = element.get('src', '')
+                if 'popmart.com' in src and any(ext in src for ext in IMAGE_EXTENSIONS):
+                    # Prefer larger images
+                    if '800x800' in src or 'large' in src:
+                        large_image = large_image or src
+                    else:  # Use any image as fallback
+                        fallback_image = fallback_image or src
+                continue
+            
+            if tag == 'title':
+                if not title_found:
+                    name = element.text_content().strip()
+                    title_found = True
+                continue
+            
+            classes = element.get('class', '').split()
+            if not classes:
+                continue
+            
+            if tag == 'div' and action_container is None and ACTION_CONTAINER_CLASS in classes:
+                action_container = element
+            
+            if not price and any(PRICE_CLASS_PATTERN.search(cls) for cls in classes):
+                price_elements.append(element)
+        
+        image_url = large_image or fallback_image
+        
+        # Additional validation using action container
+        if action_container is not None:
+            container_text = action_container.text_content().lower()
+            if 'notify me when available' in container_text:
+                in_stock = False
+            elif 'add to bag' in container_text:
+                in_stock = True
+        
+        # Look for price in specific elements
+        if not price:
+            for element in price_elements:
+                price_match = PRICE_TEXT_PATTERN.search(element.text_content())
+                if price_match:
+                    price = price_match.group(0)
+                    break
+        
+    except Exception as e:
+        errors.append(f"Error extracting product info: {e}")
+    
+    return ProductInfo(name, price, in_stock, image_url, product_url)
+
+
+def parse_page(raw_content, product_url, page, embedded_json=True):
+    """Parse a classified page into a small picklable result; runs in parse worker processes"""
+    errors = []
+    product = extract_embedded_product(raw_content, errors, product_id(product_url)) if embedded_json else None
+    if product is not None:
+        product_info = ProductInfo(product['name'], product['price'], product['in_stock'],
+                                   product['image_url'], product_url)
+        return {'product_info': product_info, 'source': f"embedded {product['source']}", 'errors': errors}
+    
+    # HTML heuristics are the fallback when the page carries no usable product data
+    product_info = extract_html_product(raw_content, product_url, page, errors)
+    return {'product_info': product_info, 'source': 'html', 'errors': errors}
+
+
+def product_id(url):
+    """Popmart product ID from a product page URL, or None"""
+    match = PRODUCT_ID_PATTERN.search(urlparse(url).path)
+    return match.group(1) if match else None
+
+
+def merge_listing_item(items, item_id, fields):
+    """Add one item to the listing results; an item shown twice with different stock is ambiguous"""
+    seen = items.get(item_id)
+    if seen is None or seen['in_stock'] is None:
+        items[item_id] = fields
+    elif fields['in_stock'] is not None and fields['in_stock'] != seen['in_stock']:
+        items[item_id] = dict(seen, in_stock=None)
+
+
+def find_next_listing_items(data, product_ids):
+    """Fields of every tracked product record in Next.js listing data, keyed by product ID"""
+    items = {}
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            item_id = node_product_id(node)
+            if item_id in product_ids:
+                fields = next_product_fields(node)
+                title = node.get('title') or node.get('name')
+                if fields is None and isinstance(title, str):
+                    # Listing records often carry the stock flags on the item instead of per SKU
+                    fields = {
+                        'source': '__NEXT_DATA__',
+                        'name': title.strip(),
+                        'price': format_price(node.get('price'), node.get('currency')),
+                        'in_stock': sku_in_stock(node),
+                        'image_url': ''
+                    }
+                if fields is not None:
+                    merge_listing_item(items, item_id, fields)
+                    continue
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            stack.extend(node)
+    return items
+
+
+def find_html_listing_items(html_bytes, product_ids):
+    """Stock badges of the product cards on a listing page, keyed by product ID"""
+    items = {}
+    root = lxml.html.fromstring(html_bytes, parser=HTML_PARSER) if html_bytes.strip() else None
+    for link in (root.iter('a') if root is not None else ()):
+        match = PRODUCT_ID_PATTERN.search(link.get('href', ''))
+        if not match or match.group(1) not in product_ids:
+            continue
+        # Only the card's own text counts; a badge outside the link can't be tied to the product
+        text = link.text_content().lower()
+        in_stock = None
+        if any(badge in text for badge in LISTING_OUT_OF_STOCK_BADGES):
+            in_stock = False
+        elif any(badge in text for badge in LISTING_IN_STOCK_BADGES):
+            in_stock = True
+        price = PRICE_TEXT_PATTERN.search(text)
+        merge_listing_item(items, match.group(1), {
+            'source': 'html',
+            'name': '',
+            'price': price.group(0) if price else '',
+            'in_stock': in_stock,
+            'image_url': ''
+        })
+    return items
+
+
+def parse_listing(raw_content, product_ids, embedded_json=True):
+    """Fields per tracked product ID found on a listing page; in_stock is None when ambiguous"""
+    errors = []
+    items = {}
+    if embedded_json:
+        match = NEXT_DATA_PATTERN.search(raw_content)
+        if match:
+            try:
+                items = find_next_listing_items(json_loads(match.group(1)), product_ids)
+            except ValueError as e:
+                errors.append(f"Could not decode __NEXT_DATA__: {e}")
+    
+    # Card badges stand in when the page data is missing or leaves items undecided
+    if not items or any(fields['in_stock'] is None for fields in items.values()):
+        try:
+            for item_id, fields in find_html_listing_items(raw_content, product_ids).items():
+                if item_id not in items or (items[item_id]['in_stock'] is None and fields['in_stock'] is not None):
+                    items[item_id] = fields
+        except Exception as e:
+            errors.append(f"Error extracting listing cards: {e}")
+    return {'items': items, 'errors': errors}
+
+
+def init_parse_worker(cpu_affinity):
+    """Pin a parse worker process to the configured CPUs"""
+    if cpu_affinity and hasattr(os, 'sched_setaffinity'):
+        try:
+            os.sched_setaffinity(0, cpu_affinity)
+        except OSError:
+            pass
+
+
+class ParsePool:
+    """Process pool for page parsing with a bounded number of pages in flight"""
+
+    def __init__(self, workers, max_pending, cpu_affinity=None, logger=None):
+        self.workers = max(int(workers), 1)
+        self.slots = threading.BoundedSemaphore(max(int(max_pending), 1))
+        self.cpu_affinity = list(cpu_affinity or [])
+        self.logger = logger
+        self.executor = None
+        self.lock = threading.Lock()
+        self.parsed = 0
+        self.fallbacks = 0
+
+    def get_executor(self):
+        """Return the worker pool, starting it on first use"""
+        with self.lock:
+            if self.executor is None:
+                # spawn keeps workers clear of locks held by this process's threads at fork time
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=init_parse_worker,
+                    initargs=(self.cpu_affinity,)
+                )
+            return self.executor
+
+    def parse(self, raw_content, product_url, page, embedded_json=True):
+        """Parse a page in a worker, blocking while max_pending pages are already queued"""
+        with self.slots:
+            executor = self.get_executor()
+            try:
+                result = executor.submit(parse_page, raw_content, product_url, page, embedded_json).result()
+                with self.lock:
+                    self.parsed += 1
+                return result
+            except BrokenProcessPool as e:
+                if self.logger:
+                    self.logger.warning(f"Parse worker pool failed ({e}), parsing in-process and restarting it")
+                with self.lock:
+                    self.fallbacks += 1
+                    if self.executor is executor:
+                        self.executor = None
+                executor.shutdown(wait=False, cancel_futures=True)
+        
+        return parse_page(raw_content, product_url, page, embedded_json)
+
+    def close(self):
+        """Stop the worker processes"""
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+def build_embed(title, description, color=0x00ff00, fields=None, image_url=None):
+    """Discord embed dict for a notification"""
+    embed = {
+        'title': title,
+        'description': description,
+        'color': color,
+        'timestamp': datetime.now(timezone.utc).isoformat()
+    }
+    
+    if fields:
+        embed['fields'] = [
+            {
+                'name': field.get('name', ''),
+                'value': field.get('value', ''),
+                'inline': field.get('inline', False)
+            }
+            for field in fields
+        ]
+    
+    if image_url:
+        embed['image'] = {'url': image_url}
+    return embed
+
+
+def stock_notification_embed(product_info):
+    """Discord embed announcing that a product is in stock"""
+    fields = [
+        {
+            'name': '💰 Price',
+            'value': product_info.price or 'N/A',
+            'inline': True
+        },
+        {
+            'name': '🔗 Direct Buy Link',
+            'value': f"[BUY NOW]({product_info.direct_buy_url})",
+            'inline': True
+        },
+        {
+            'name': '⏰ Time',
+            'value': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'inline': True
+        }
+    ]
+    
+    return build_embed(
+        title="🎉 PRODUCT IN STOCK!",
+        description=f"**{product_info.name}** is now available!",
+        color=0x00ff00,
+        fields=fields,
+        image_url=product_info.image_url
+    )
+
+
+def flatten_settings(config, prefix=''):
+    """Every setting except the product list as {'section.key': value}"""
+    settings = {}
+    for key, value in config.items():
+        if not prefix and key == 'products':
+            continue
+        if isinstance(value, dict):
+            settings.update(flatten_settings(value, f"{prefix}{key}."))
+        else:
+            settings[f"{prefix}{key}"] = value
+    return settings
+
+
+def validate_config(config):
+    """List of problems that make a config unsafe to apply; empty when it is valid"""
+    if not isinstance(config, dict):
+        return ["config must be a JSON object"]
+    
+    errors = []
+    products = config.get('products', [])
+    if not isinstance(products, list):
+        errors.append("products must be a list")
+        products = []
+    seen = set()
+    for index, product in enumerate(products):
+        if not isinstance(product, dict):
+            errors.append(f"products[{index}] must be an object")
+            continue
+        url = product.get('url')
+        if not isinstance(product.get('name'), str) or not product['name'].strip():
+            errors.append(f"products[{index}] needs a name")
+        if not isinstance(url, str) or urlparse(url).scheme not in ('http', 'https') or not urlparse(url).netloc:
+            errors.append(f"products[{index}] needs an http(s) url")
+        elif url in seen:
+            errors.append(f"products[{index}] repeats {url}")
+        seen.add(url)
+        for key in ('interval_minutes', 'jitter_seconds'):
+            value = product.get(key)
+            if key in product and (isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0):
+                errors.append(f"products[{index}].{key} must be a non-negative number")
+    
+    for key, value in config.items():
+        if key not in ('products', 'discord_webhook_url') and not isinstance(value, dict):
+            errors.append(f"{key} must be an object")
+    
+    listing_urls = config.get('listings', {}).get('urls', []) if isinstance(config.get('listings', {}), dict) else []
+    if not isinstance(listing_urls, list):
+        errors.append("listings.urls must be a list")
+        listing_urls = []
+    for index, url in enumerate(listing_urls):
+        if not isinstance(url, str) or urlparse(url).scheme not in ('http', 'https') or not urlparse(url).netloc:
+            errors.append(f"listings.urls[{index}] must be an http(s) url")
+    
+    settings = flatten_settings(config)
+    for key, minimum in CONFIG_MINIMUMS.items():
+        if key not in settings or settings[key] is None:
+            continue
+        value = settings[key]
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            errors.append(f"{key} must be a number")
+        elif value < minimum:
+            errors.append(f"{key} must be at least {minimum}")
+    return errors
+
+
+def diff_config(old, new):
+    """Products added, removed and changed (by URL) and the settings whose value changed"""
+    old_products = {product.url: product for product in old.get('products', [])}
+    new_products = {product.url: product for product in new.get('products', [])}
+    old_settings = flatten_settings(old)
+    new_settings = flatten_settings(new)
+    return {
+        'added': [product for url, product in new_products.items() if url not in old_products],
+        'removed': [url for url in old_products if url not in new_products],
+        'changed': [product for url, product in new_products.items()
+                    if url in old_products and old_products[url] != product],
+        'settings': sorted(key for key in old_settings.keys() | new_settings.keys()
+                           if old_settings.get(key) != new_settings.get(key)),
+    }
+
+
+def span(name):
+    """Decorator timing a PopmartMonitor method into the popmart_span_seconds histogram"""
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.metrics.time('popmart_span_seconds', span=name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class MetricsRegistry:
+    """Thread-safe counters and latency histograms rendered in the Prometheus text format"""
+
+    def __init__(self, buckets=METRIC_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counters = {}
+        self.histograms = {}
+        self.collectors = []
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(name, labels):
+        """Series key: the metric name plus its sorted label pairs"""
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, amount=1, **labels):
+        """Add to a counter"""
+        key = self.key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, seconds, **labels):
+        """Record one duration in a histogram"""
+        key = self.key(name, labels)
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            histogram[0][index] += 1
+            histogram[1] += seconds
+            histogram[2] += 1
+
+    @contextmanager
+    def time(self, name, **labels):
+        """Observe the duration of the with-block"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def add_collector(self, collector):
+        """Register a callable returning (name, labels, value) samples read at scrape time"""
+        self.collectors.append(collector)
+
+    @staticmethod
+    def format_labels(labels):
+        """Render label pairs as {name="value",...} with Prometheus escaping"""
+        if not labels:
+            return ''
+        pairs = []
+        for name, value in labels:
+            value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+            pairs.append(f'{name}="{value}"')
+        return '{' + ','.join(pairs) + '}'
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        samples = {}
+        with self.lock:
+            for (name, labels), value in self.counters.items():
+                samples.setdefault(name, []).append((name, labels, value))
+            histograms = [(key, list(counts), total, count) for key, (counts, total, count) in self.histograms.items()]
+        
+        for key, counts, total, count in histograms:
+            name, labels = key
+            series = samples.setdefault(name, [])
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                series.append((f"{name}_bucket", labels + (('le', le),), cumulative))
+            series.append((f"{name}_sum", labels, total))
+            series.append((f"{name}_count", labels, count))
+        
+        for collector in self.collectors:
+            for name, labels, value in collector():
+                samples.setdefault(name, []).append((name, tuple(sorted(labels.items())), value))
+        
+        lines = []
+        for name in sorted(samples):
+            metric_type, help_text = METRIC_DEFINITIONS.get(name, ('untyped', name))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for sample_name, labels, value in samples[name]:
+                lines.append(f"{sample_name}{self.format_labels(labels)} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def quantile(self, counts, count, share):
+        """Upper bucket bound below which the given share of observations fall"""
+        target = count * share
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += bucket_count
+            if cumulative >= target:
+                return bound
+        return float('inf')
+
+    def summary(self, name, label):
+        """One-line count, average and approximate p95 per value of a histogram label"""
+        merged = {}
+        with self.lock:
+            for (metric, labels), (counts, total, count) in self.histograms.items():
+                if metric != name:
+                    continue
+                value = dict(labels).get(label, '')
+                entry = merged.setdefault(value, [[0] * len(counts), 0.0, 0])
+                entry[0] = [a + b for a, b in zip(entry[0], counts)]
+                entry[1] += total
+                entry[2] += count
+        
+        parts = []
+        for value, (counts, total, count) in sorted(merged.items()):
+            if count:
+                p95 = self.quantile(counts, count, 0.95)
+                # The +Inf bucket only says the samples were slower than the largest bound
+                p95 = f">{self.buckets[-1]:g}s" if p95 == float('inf') else f"<={p95:g}s"
+                parts.append(f"{value} {count}x avg {total / count:.2f}s p95{p95}")
+        return ', '.join(parts)
+
+    def counter_summary(self, name, group, split):
+        """One-line counts of a counter, grouped by one label and split by another"""
+        grouped = {}
+        with self.lock:
+            for (metric, labels), value in self.counters.items():
+                if metric != name:
+                    continue
+                labels = dict(labels)
+                outcomes = grouped.setdefault(labels.get(group, ''), {})
+                outcomes[labels.get(split, '')] = outcomes.get(labels.get(split, ''), 0) + value
+        return ', '.join(f"{key} " + '/'.join(f"{outcome}:{count}" for outcome, count in sorted(outcomes.items()))
+                         for key, outcomes in sorted(grouped.items()))
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Serves the registry at /metrics and starts profile captures on POST /profile"""
+
+    registry = None
+    profiler = None
+
+    def do_POST(self):
+        path, _, query = self.path.partition('?')
+        if path != '/profile' or self.profiler is None:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        
+        values = parse_qs(query).get('cycles', ['3'])
+        cycles = int(values[-1]) if values[-1].isdigit() else 0
+        if not 1 <= cycles <= MAX_PROFILE_CYCLES:
+            status, body = 400, f"cycles must be a whole number from 1 to {MAX_PROFILE_CYCLES}\n".encode()
+        elif self.profiler.request(cycles):
+            status, body = 202, f"profiling the next {cycles} cycles\n".encode()
+        else:
+            status, body = 409, b"a capture is already pending\n"
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        
+        body = self.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class HostRateLimiter:
+    """Thread-safe token bucket that caps requests per minute for each host"""
+
+    def __init__(self, requests_per_minute, burst=1):
+        self.rate = max(float(requests_per_minute), 0.1) / 60.0
+        self.burst = max(int(burst), 1)
+        self.tokens = {}
+        self.updated = {}
+        self.acquired = 0
+        self.lock = threading.Lock()
+
+    def reserve(self, url):
+        """Reserve one request slot for the URL's host and return the seconds until it is due"""
+        host = intern_text(urlparse(url).netloc)
+        with self.lock:
+            self.acquired += 1
+            now = time.monotonic()
+            tokens = self.tokens.get(host, float(self.burst))
+            elapsed = now - self.updated.get(host, now)
+            tokens = min(float(self.burst), tokens + elapsed * self.rate) - 1
+            self.tokens[host] = tokens
+            self.updated[host] = now
+            return -tokens / self.rate if tokens < 0 else 0.0
+
+    def configure(self, requests_per_minute, burst):
+        """Change the rate and burst without losing the current buckets"""
+        with self.lock:
+            self.rate = max(float(requests_per_minute), 0.1) / 60.0
+            self.burst = max(int(burst), 1)
+
+    def acquire(self, url):
+        """Reserve one request slot for the URL's host, sleeping until it is due"""
+        wait = self.reserve(url)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class SessionPool:
+    """Thread-safe pool of long-lived HTTP sessions keyed by host and client configuration"""
+
+    def __init__(self, max_connections=10, idle_timeout=300):
+        self.max_connections = max(int(max_connections), 1)
+        self.idle_timeout = idle_timeout
+        self.sessions = {}
+        self.last_used = {}
+        self.slots = {}
+        self.lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    def get(self, url, client_key, factory):
+        """Return the pooled session for the URL's host and client key, creating it on first use"""
+        key = (urlparse(url).netloc, client_key)
+        self.evict_idle()
+
+        with self.lock:
+            session = self.sessions.get(key)
+            if session is None:
+                session = factory()
+                self.sessions[key] = session
+                self.created += 1
+                self.configure(session, self.max_connections)
+            else:
+                self.reused += 1
+            self.last_used[key] = time.monotonic()
+            return session
+
+    @contextmanager
+    def slot(self, url):
+        """Hold one of the host's connection slots, shared by every session for that host"""
+        host = urlparse(url).netloc
+        with self.lock:
+            semaphore = self.slots.get(host)
+            if semaphore is None:
+                semaphore = self.slots[host] = threading.BoundedSemaphore(self.max_connections)
+        with semaphore:
+            yield
+
+    @staticmethod
+    def configure(session, maxsize):
+        """Mount fresh adapters that keep up to maxsize connections alive for reuse"""
+        for prefix, adapter in list(session.adapters.items()):
+            options = {'pool_connections': 1, 'pool_maxsize': maxsize,
+                       'max_retries': adapter.max_retries}
+            # cloudscraper's adapter carries the TLS context behind its browser-like handshake
+            for name in ('ssl_context', 'cipherSuite', 'source_address', 'server_hostname', 'ecdhCurve'):
+                if hasattr(adapter, name):
+                    options[name] = getattr(adapter, name)
+            session.mount(prefix, type(adapter)(**options))
+            adapter.close()
+
+    def evict_idle(self):
+        """Close sessions that have not been used within the idle timeout"""
+        now = time.monotonic()
+        with self.lock:
+            idle = [key for key, used in self.last_used.items() if now - used > self.idle_timeout]
+            for key in idle:
+                session = self.sessions.pop(key)
+                del self.last_used[key]
+                try:
+                    session.close()
+                except Exception:
+                    pass
+        return len(idle)
+
+    def close(self):
+        """Close all pooled sessions"""
+        with self.lock:
+            for session in self.sessions.values():
+                try:
+                    session.close()
+                except Exception:
+                    pass
+            self.sessions.clear()
+            self.last_used.clear()
+            # Requests still in flight release the semaphores they acquired
+            self.slots.clear()
+
+
+class PageCache:
+    """Per-URL ETag/Last-Modified validators together with the last parsed product info"""
+
+    def __init__(self):
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def conditional_headers(self, url):
+        """Return If-None-Match/If-Modified-Since headers for a cached URL"""
+        with self.lock:
+            entry = self.entries.get(url)
+        if not entry:
+            return {}
+
+        headers = {}
+        if entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def lookup(self, url):
+        """Return a copy of the product info cached for a not-modified response"""
+        with self.lock:
+            entry = self.entries.get(url)
+            if not entry:
+                return None
+            self.hits += 1
+            return entry['product_info'].copy()
+
+    def store(self, url, response, product_info):
+        """Remember the response validators and parsed product info for the URL"""
+        with self.lock:
+            self.misses += 1
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+            if etag or last_modified:
+                self.entries[url] = {
+                    'etag': etag,
+                    'last_modified': last_modified,
+                    'product_info': product_info.copy()
+                }
+            else:
+                self.entries.pop(url, None)
+
+    def hit_ratio(self):
+        """Share of checks answered with 304 Not Modified"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class PageClassification:
+    """Page type plus the markers and marker groups found on a page"""
+
+    __slots__ = ('page_type', 'markers', 'groups', 'length')
+
+    def __init__(self, page_type, markers, groups, length):
+        self.page_type = page_type
+        self.markers = markers
+        self.groups = groups
+        self.length = length
+
+    def has(self, group):
+        """Whether any marker of the group was found"""
+        return group in self.groups
+
+    def __repr__(self):
+        return f"PageClassification({self.page_type!r}, markers={sorted(self.markers)!r})"
+
+
+class PageClassifier:
+    """Marker-table classifier for challenge, login, product and error pages, run over one lower-cased copy"""
+
+    def __init__(self, markers=PAGE_MARKERS):
+        self.marker_groups = {}
+        case_sensitive = set()
+        for group, group_markers in markers.items():
+            for marker in group_markers:
+                self.marker_groups.setdefault(marker, set()).add(group)
+                if group in CASE_SENSITIVE_GROUPS:
+                    case_sensitive.add(marker)
+
+        # (marker, lower-cased needle, exact needle for case-sensitive markers) per content type
+        self.text_table = [
+            (marker, marker.lower(), marker if marker in case_sensitive else None)
+            for marker in self.marker_groups
+        ]
+        self.bytes_table = [
+            (marker, lowered.encode('utf-8'), exact.encode('utf-8') if exact else None)
+            for marker, lowered, exact in self.text_table
+        ]
+
+    def classify(self, content):
+        """Classify raw bytes or text with one lower-cased copy of the page"""
+        if content is None:
+            content = b''
+        table = self.bytes_table if isinstance(content, bytes) else self.text_table
+        lowered = content.lower()
+
+        markers = set()
+        groups = set()
+        for marker, needle, exact in table:
+            if needle in lowered and (exact is None or exact in content):
+                markers.add(marker)
+                groups.update(self.marker_groups[marker])
+
+        return PageClassification(self.page_type(groups), frozenset(markers), frozenset(groups), len(content))
+
+    @staticmethod
+    def page_type(groups):
+        """Derive the page type from the marker groups found"""
+        if 'challenge' in groups:
+            return 'challenge'
+        if 'out_of_stock' in groups or 'in_stock' in groups:
+            return 'product'
+        if 'login' in groups:
+            return 'login'
+        # Error and interstitial pages often mention the brand, so they win over plain content
+        if 'denied' in groups:
+            return 'blocked'
+        if 'interstitial' in groups:
+            return 'challenge'
+        if 'content' in groups:
+            return 'content'
+        return 'unknown'
+
+
+class ContentFingerprints:
+    """Per-product hashes of the stock-relevant page region with the product info parsed from it"""
+
+    def __init__(self):
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def compute(raw, page):
+        """Hash the title, price, action container window and stock markers of a page"""
+        digest = hashlib.blake2b(digest_size=16)
+
+        title_match = FINGERPRINT_TITLE_PATTERN.search(raw)
+        digest.update(title_match.group(0) if title_match else b'')
+        digest.update(b'\0')
+
+        price_match = FINGERPRINT_PRICE_PATTERN.search(raw)
+        digest.update(price_match.group(0) if price_match else b'')
+        digest.update(b'\0')
+
+        index = raw.find(FINGERPRINT_CONTAINER_MARKER)
+        if index >= 0:
+            digest.update(raw[index:index + FINGERPRINT_CONTAINER_WINDOW])
+        digest.update(b'\0')
+
+        # Page-wide stock markers also decide the result, so they are part of the fingerprint
+        stock_markers = sorted(marker for marker in page.markers
+                               if marker in PAGE_MARKERS['out_of_stock'] or marker in PAGE_MARKERS['in_stock'])
+        digest.update('|'.join(stock_markers).encode('utf-8'))
+        digest.update(b'\0')
+
+        # Embedded page data is the primary stock source, so its stock fields count too
+        blocks = [match.group(1) for match in JSON_LD_PATTERN.finditer(raw)]
+        next_data = NEXT_DATA_PATTERN.search(raw)
+        if next_data:
+            blocks.append(next_data.group(1))
+        for block in blocks:
+            for field in FINGERPRINT_STOCK_FIELD_PATTERN.finditer(block):
+                digest.update(field.group(0))
+                digest.update(b'|')
+        return digest.hexdigest()
+
+    def lookup(self, url, fingerprint):
+        """Return a copy of the product info if the fingerprint matches the last one seen"""
+        with self.lock:
+            entry = self.entries.get(url)
+            if entry and entry[0] == fingerprint:
+                self.hits += 1
+                return entry[1].copy()
+            self.misses += 1
+            return None
+
+    def store(self, url, fingerprint, product_info):
+        """Remember the fingerprint and parsed product info for the URL"""
+        with self.lock:
+            self.entries[url] = (fingerprint, product_info.copy())
+
+
+class ProductStateStore:
+    """SQLite-backed last known state per product, used for warm starts and edge-triggered alerts"""
+
+    FIELDS = ProductState.__slots__
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS product_state ('
+            'url TEXT PRIMARY KEY, name TEXT, in_stock INTEGER, price TEXT, image_url TEXT, '
+            'fingerprint TEXT, last_seen REAL, last_change REAL, '
+            'checks INTEGER NOT NULL DEFAULT 0, failures INTEGER NOT NULL DEFAULT 0)'
+        )
+        self.connection.commit()
+        self.states = self.load()
+
+    def load(self):
+        """Read every stored product state into memory"""
+        rows = self.connection.execute(f"SELECT {', '.join(self.FIELDS)} FROM product_state").fetchall()
+        return {row[0]: ProductState(*row) for row in rows}
+
+    def get(self, url):
+        """Return a copy of the last known state for the URL, or None"""
+        with self.lock:
+            state = self.states.get(url)
+            return state.copy() if state else None
+
+    def record(self, url, product_info, fingerprint=None, now=None):
+        """Store the result of a successful check and return the previous state"""
+        now = now or time.time()
+        with self.lock:
+            previous = self.states.get(url)
+            changed = previous is None or previous.in_stock != product_info.in_stock
+            state = ProductState(
+                url,
+                name=product_info.name,
+                in_stock=product_info.in_stock,
+                price=product_info.price,
+                image_url=product_info.image_url,
+                fingerprint=fingerprint or (previous.fingerprint if previous else None),
+                last_seen=now,
+                last_change=now if changed else previous.last_change,
+                checks=(previous.checks if previous else 0) + 1,
+                failures=previous.failures if previous else 0
+            )
+            self.states[url] = state
+            self.write(state)
+            return previous.copy() if previous else None
+
+    def rearm(self, url):
+        """Mark an in-stock product out of stock again so its next in-stock check alerts once more"""
+        with self.lock:
+            state = self.states.get(url)
+            if state is None or not state.in_stock:
+                return False
+            state.in_stock = False
+            self.write(state)
+            return True
+
+    def adopt(self, state):
+        """Replace the state for a URL with one recorded elsewhere, e.g. by another shard"""
+        with self.lock:
+            self.states[state.url] = state.copy()
+            self.write(self.states[state.url])
+
+    def record_failure(self, url):
+        """Count a check that could not fetch or parse the product"""
+        with self.lock:
+            state = self.states.get(url)
+            if state is None:
+                state = ProductState(url)
+                self.states[url] = state
+            state.checks += 1
+            state.failures += 1
+            self.write(state)
+
+    def write(self, state):
+        """Upsert one state row; callers hold the lock"""
+        self.connection.execute(
+            f"INSERT OR REPLACE INTO product_state ({', '.join(self.FIELDS)}) "
+            f"VALUES ({', '.join('?' for _ in self.FIELDS)})",
+            [int(state.in_stock) if field == 'in_stock' else getattr(state, field) for field in self.FIELDS]
+        )
+        self.connection.commit()
+
+    def close(self):
+        """Close the database connection"""
+        with self.lock:
+            self.connection.close()
+
+
+class DiscordDispatcher:
+    """Background Discord webhook sender with batching, a persistent connection and 429 handling"""
+
+    MAX_EMBEDS_PER_MESSAGE = 10
+
+    def __init__(self, webhook_url, logger, max_queue=1000, batch_window=1.0, max_attempts=5):
+        self.webhook_url = webhook_url
+        self.logger = logger
+        self.batch_window = batch_window
+        self.max_attempts = max_attempts
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.session = requests.Session()
+        self.thread = None
+        self.stopping = object()
+
+        self.sent = 0
+        self.batches = 0
+        self.failed = 0
+        self.dropped = 0
+        self.rate_limited = 0
+        self.latencies = deque(maxlen=200)
+
+    def start(self):
+        """Start the sender thread"""
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self.run, name='discord-dispatcher', daemon=True)
+            self.thread.start()
+
+    def resize(self, max_queue):
+        """Change the queue bound in place, keeping embeds that are already queued"""
+        with self.queue.mutex:
+            self.queue.maxsize = max_queue
+            self.queue.not_full.notify_all()
+
+    def submit(self, embed, on_failure=None):
+        """Queue an embed for delivery without blocking the caller
+
+        on_failure is called from the sender thread if the embed could not be delivered.
+        """
+        try:
+            self.queue.put_nowait((embed, on_failure))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            self.logger.error("Discord notification queue is full, dropping notification")
+            return False
+
+    def run(self):
+        """Collect queued embeds into batches of up to ten and send them"""
+        while True:
+            entry = self.queue.get()
+            if entry is self.stopping:
+                return
+
+            batch = [entry]
+            stop = False
+            deadline = time.monotonic() + self.batch_window
+            # Products that change together within the batch window share one webhook call
+            while len(batch) < self.MAX_EMBEDS_PER_MESSAGE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    entry = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if entry is self.stopping:
+                    stop = True
+                    break
+                batch.append(entry)
+
+            if not self.send([embed for embed, _ in batch]):
+                for _, on_failure in batch:
+                    if on_failure is None:
+                        continue
+                    try:
+                        on_failure()
+                    except Exception as e:
+                        self.logger.error(f"Error handling an undelivered Discord notification: {e}")
+            if stop:
+                return
+
+    def backoff(self, attempt):
+        """Sleep before the next attempt, doubling up to 30s; no sleep after the last attempt"""
+        if attempt + 1 < self.max_attempts:
+            time.sleep(min(2 ** attempt, 30))
+
+    def send(self, batch):
+        """POST one batch, honouring Retry-After on 429s and backing off on server errors"""
+        for attempt in range(self.max_attempts):
+            start = time.monotonic()
+            try:
+                response = self.session.post(self.webhook_url, json={'embeds': batch}, timeout=15)
+            except Exception as e:
+                self.logger.error(f"Error sending Discord notification: {e}")
+                self.backoff(attempt)
+                continue
+            self.latencies.append(time.monotonic() - start)
+
+            if response.status_code == 429:
+                self.rate_limited += 1
+                retry_after = self.retry_after(response)
+                self.logger.warning(f"Discord rate limited, retrying in {retry_after:.2f}s")
+                time.sleep(retry_after)
+                continue
+
+            if response.status_code in (200, 204):
+                self.sent += len(batch)
+                self.batches += 1
+                for embed in batch:
+                    self.logger.info(f"Discord notification sent: {embed.get('title')}")
+                return True
+
+            if response.status_code >= 500:
+                self.logger.warning(f"Discord returned {response.status_code} "
+                                    f"(attempt {attempt + 1}/{self.max_attempts})")
+                self.backoff(attempt)
+                continue
+
+            self.logger.error(f"Failed to send Discord notification: {response.status_code}")
+            break
+
+        self.failed += len(batch)
+        return False
+
+    @staticmethod
+    def retry_after(response):
+        """Seconds to wait from a 429 response's Retry-After header or JSON body"""
+        for header in ('Retry-After', 'X-RateLimit-Reset-After'):
+            try:
+                return max(float(response.headers[header]), 0.0)
+            except (KeyError, ValueError):
+                pass
+        try:
+            return max(float(response.json().get('retry_after', 1.0)), 0.0)
+        except Exception:
+            return 1.0
+
+    def stats(self):
+        """Queue depth, delivery counters and send latency summary"""
+        latencies = sorted(self.latencies)
+        return {
+            'queue_depth': self.queue.qsize(),
+            'sent': self.sent,
+            'batches': self.batches,
+            'failed': self.failed,
+            'dropped': self.dropped,
+            'rate_limited': self.rate_limited,
+            'latency_avg': sum(latencies) / len(latencies) if latencies else 0.0,
+            'latency_p95': latencies[int(len(latencies) * 0.95)] if latencies else 0.0,
+        }
+
+    def stop(self, timeout=10):
+        """Flush queued embeds and stop the sender thread"""
+        if self.thread is None:
+            return
+        try:
+            self.queue.put(self.stopping, timeout=timeout)
+        except queue.Full:
+            pass
+        self.thread.join(timeout)
+        self.session.close()
+
+
+class BrowserPool:
+    """Pool of long-lived browser instances with checkout/return semantics"""
+
+    def __init__(self, factory, size, logger):
+        self.factory = factory
+        self.size = max(int(size), 1)
+        self.logger = logger
+        self.idle = queue.LifoQueue()
+        self.slots = threading.BoundedSemaphore(self.size)
+        self.create_lock = threading.Lock()
+        self.drivers = set()
+        # Browsers being started; they count against the size so warm-up and cold starts can't overshoot
+        self.starting = 0
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.cold_starts = 0
+
+    def reserve(self):
+        """Claim room for one more browser; False when the pool is full or its last browsers are starting"""
+        with self.lock:
+            if len(self.drivers) + self.starting >= self.size:
+                return False
+            self.starting += 1
+            return True
+
+    def create(self):
+        """Start a browser in a slot claimed with reserve(), serialised as driver patching is not thread-safe"""
+        driver = None
+        try:
+            with self.create_lock:
+                driver = self.factory()
+        finally:
+            with self.lock:
+                self.starting -= 1
+                if driver is not None:
+                    self.drivers.add(driver)
+        return driver
+
+    def checkout(self):
+        """An idle browser, a new one if the pool has room, or else the next one returned or warmed"""
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        while not self.reserve():
+            try:
+                return self.idle.get(timeout=1)
+            except queue.Empty:
+                continue
+        self.cold_starts += 1
+        return self.create()
+
+    def warm(self):
+        """Start browsers until the pool is full"""
+        while True:
+            if not self.reserve():
+                return
+            driver = self.create()
+            if driver is None:
+                self.logger.warning("Browser pool pre-warm stopped: no driver could be created")
+                return
+            self.idle.put(driver)
+            self.logger.info(f"Browser pool warmed {len(self.drivers)}/{self.size}")
+
+    def warm_in_background(self):
+        """Pre-warm the pool without blocking startup"""
+        threading.Thread(target=self.warm, name='browser-pool-warm', daemon=True).start()
+
+    @contextmanager
+    def page(self):
+        """Check out a browser for one page load, capping concurrent pages at the pool size"""
+        self.slots.acquire()
+        driver = None
+        try:
+            driver = self.checkout()
+            self.checkouts += 1
+            yield driver
+        except Exception:
+            # A driver that raised may be wedged, so replace it rather than returning it
+            self.discard(driver)
+            driver = None
+            raise
+        finally:
+            if driver is not None:
+                self.idle.put(driver)
+            self.slots.release()
+
+    def discard(self, driver):
+        """Quit a broken driver and drop it from the pool"""
+        if driver is None:
+            return
+        with self.lock:
+            self.drivers.discard(driver)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def close(self):
+        """Quit every pooled browser"""
+        with self.lock:
+            drivers = list(self.drivers)
+            self.drivers.clear()
+        for driver in drivers:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+
+
+class ProductScheduler:
+    """Priority queue of next-due check times, one entry per product URL"""
+
+    def __init__(self):
+        self.heap = []
+        self.entries = {}
+        self.counter = itertools.count()
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+
+    def schedule(self, url, due):
+        """Set the next due time for a product, replacing any earlier entry"""
+        with self.lock:
+            entry = [due, next(self.counter), url]
+            self.entries[url] = entry
+            heapq.heappush(self.heap, entry)
+        self.wake.set()
+
+    def reschedule(self, url, due):
+        """Move the next due time of a queued product; products not queued are left alone"""
+        with self.lock:
+            if url not in self.entries:
+                return
+            entry = [due, next(self.counter), url]
+            self.entries[url] = entry
+            heapq.heappush(self.heap, entry)
+        self.wake.set()
+
+    def remove(self, url):
+        """Stop scheduling a product; its stale heap entry is skipped lazily"""
+        with self.lock:
+            self.entries.pop(url, None)
+        self.wake.set()
+
+    def pop_due(self, now):
+        """Remove and return (url, due) for every product due at or before now"""
+        due = []
+        with self.lock:
+            while self.heap and self.heap[0][0] <= now:
+                entry = heapq.heappop(self.heap)
+                if self.entries.get(entry[2]) is entry:
+                    del self.entries[entry[2]]
+                    due.append((entry[2], entry[0]))
+        return due
+
+    def next_due(self):
+        """Earliest due time, or None when nothing is scheduled"""
+        with self.lock:
+            while self.heap and self.entries.get(self.heap[0][2]) is not self.heap[0]:
+                heapq.heappop(self.heap)
+            return self.heap[0][0] if self.heap else None
+
+    def wait(self, timeout):
+        """Sleep until the timeout or until the schedule changes"""
+        self.wake.wait(timeout)
+        self.wake.clear()
+
+
+class RequestBudget:
+    """Splits a global requests-per-minute budget across products by weight"""
+
+    def __init__(self, requests_per_minute, min_interval=30, max_interval=None,
+                 change_half_life_hours=24, error_window=20):
+        self.rate = max(float(requests_per_minute), 0.1) / 60.0
+        self.min_interval = max(float(min_interval), 1.0)
+        self.max_interval = float(max_interval) if max_interval else None
+        self.half_life = max(float(change_half_life_hours), 0.1) * 3600
+        self.outcomes = {}
+        self.error_window = max(int(error_window), 1)
+        self.requests_per_check = 1.0
+        self.intervals = {}
+        self.weights = {}
+        self.over_budget = False
+        self.lock = threading.Lock()
+
+    def record(self, url, success):
+        """Remember the outcome of one check for the product's recent error rate"""
+        with self.lock:
+            outcomes = self.outcomes.get(url)
+            if outcomes is None:
+                outcomes = self.outcomes[url] = deque(maxlen=self.error_window)
+            outcomes.append(bool(success))
+
+    def observe_cost(self, requests_made, checks):
+        """Track the average number of HTTP requests one product check costs"""
+        if checks <= 0:
+            return
+        sample = max(requests_made / checks, 1.0)
+        with self.lock:
+            self.requests_per_check = 0.8 * self.requests_per_check + 0.2 * sample
+
+    def error_rate(self, url):
+        """Share of recent checks for the product that failed"""
+        with self.lock:
+            outcomes = self.outcomes.get(url)
+            if not outcomes:
+                return 0.0
+            return outcomes.count(False) / len(outcomes)
+
+    def weight(self, product, state, now):
+        """Relative share of the budget: priority, scaled by recent change and error rate"""
+        weight = max(float(product.priority), 0.01)
+        
+        # Products that changed recently are the ones most likely to change again soon
+        last_change = state.last_change if state else None
+        if last_change:
+            age = max(now - last_change, 0.0)
+            weight *= 0.2 + 0.8 * 0.5 ** (age / self.half_life)
+        
+        # Products that keep failing burn requests without producing a result
+        weight *= 1.0 - 0.8 * self.error_rate(product.url)
+        return weight
+
+    def allocate(self, products, states, now=None):
+        """Compute a check interval in seconds for each product URL within the budget"""
+        now = now or time.time()
+        cost = self.requests_per_check
+        # Checks per second the budget pays for
+        available = self.rate / cost
+        rates = {}
+        
+        # Products with an explicit interval are pinned and paid for first
+        for product in products:
+            if product.interval_minutes is not None:
+                rates[product.url] = 1.0 / (max(float(product.interval_minutes), 0.1) * 60)
+        
+        weights = {product.url: self.weight(product, states.get(product.url), now)
+                   for product in products if product.url not in rates}
+        
+        # Every other product first gets the rate that max_check_interval_minutes guarantees
+        base_rate = 1.0 / self.max_interval if self.max_interval else 0.0
+        max_rate = max(1.0 / self.min_interval, base_rate)
+        guaranteed = sum(rates.values()) + base_rate * len(weights)
+        unmet = guaranteed > available
+        if unmet:
+            # Pinned and guaranteed rates don't fit, so they shrink to the budget instead of
+            # exceeding it; without a guarantee the other products keep a per-product share
+            reserve = 0.0 if base_rate else available * len(weights) / max(len(products), 1)
+            factor = (available - reserve) / guaranteed if guaranteed else 0.0
+            for url in rates:
+                rates[url] *= factor
+            base_rate *= factor
+            remaining = reserve
+        else:
+            remaining = available - guaranteed
+        
+        # The rest of the budget is water-filled by weight, never above one check per
+        # min_interval, and whatever a capped product cannot use is shared among the others
+        active = dict(weights)
+        while active:
+            share = max(remaining, 0.0) / sum(active.values())
+            capped = [url for url, weight in active.items() if base_rate + weight * share >= max_rate]
+            if not capped:
+                for url, weight in active.items():
+                    rates[url] = base_rate + weight * share
+                break
+            for url in capped:
+                rates[url] = max_rate
+                remaining -= max_rate - base_rate
+                del active[url]
+        
+        # Products left with no budget at all fall back to their configured interval
+        intervals = {url: 1.0 / rate for url, rate in rates.items() if rate > 0}
+        
+        total = sum(cost / interval for interval in intervals.values())
+        with self.lock:
+            self.intervals = intervals
+            self.weights = weights
+            self.over_budget = unmet or total > self.rate * 1.001 or len(intervals) < len(rates)
+        return intervals
+
+    def interval(self, url):
+        """Last allocated interval for the URL, or None if it has not been allocated"""
+        with self.lock:
+            return self.intervals.get(url)
+
+
+class FetchStrategySelector:
+    """Rolling success rate and latency per fetch strategy, ordering them best-first with cooldowns"""
+
+    def __init__(self, strategies=FETCH_STRATEGIES, window=20, failure_threshold=3,
+                 cooldown=300, max_cooldown=3600, adaptive=True):
+        self.strategies = list(strategies)
+        self.window = max(int(window), 1)
+        self.failure_threshold = max(int(failure_threshold), 1)
+        self.cooldown = float(cooldown)
+        self.max_cooldown = max(float(max_cooldown), self.cooldown)
+        self.adaptive = adaptive
+        self.history = {name: deque(maxlen=self.window) for name in self.strategies}
+        self.consecutive_failures = dict.fromkeys(self.strategies, 0)
+        self.trips = dict.fromkeys(self.strategies, 0)
+        self.cooldown_until = dict.fromkeys(self.strategies, 0.0)
+        self.lock = threading.Lock()
+
+    def success_rate(self, name):
+        """Rolling success rate with a one-success, one-failure prior; callers hold the lock"""
+        history = self.history[name]
+        return (sum(1 for success, _ in history if success) + 1) / (len(history) + 2)
+
+    def latency(self, name):
+        """Rolling average latency blended with the strategy's prior; callers hold the lock"""
+        history = self.history[name]
+        return (FETCH_STRATEGY_PRIORS.get(name, 10.0) + sum(latency for _, latency in history)) / (len(history) + 1)
+
+    def score(self, name):
+        """Expected seconds spent per successful fetch; lower is better"""
+        return self.latency(name) / self.success_rate(name)
+
+    def order(self, now=None):
+        """Return (strategies to try in order, strategies skipped because they are cooling down)"""
+        now = now or time.monotonic()
+        with self.lock:
+            if not self.adaptive:
+                return list(self.strategies), []
+            
+            ranked = sorted(self.strategies, key=lambda name: (self.score(name), self.strategies.index(name)))
+            ready = [name for name in ranked if self.cooldown_until[name] <= now]
+            skipped = [name for name in ranked if self.cooldown_until[name] > now]
+            if not ready:
+                # Everything is cooling down: probe whichever strategy comes back first
+                probe = min(skipped, key=lambda name: self.cooldown_until[name])
+                ready = [probe]
+                skipped.remove(probe)
+            return ready, skipped
+
+    def record(self, name, success, latency, now=None):
+        """Record one attempt; returns True when the failure puts the strategy into cooldown"""
+        now = now or time.monotonic()
+        with self.lock:
+            self.history[name].append((success, latency))
+            if success:
+                self.consecutive_failures[name] = 0
+                self.trips[name] = 0
+                self.cooldown_until[name] = 0.0
+                return False
+            
+            self.consecutive_failures[name] += 1
+            if not self.adaptive or self.consecutive_failures[name] < self.failure_threshold:
+                return False
+            
+            # Each cooldown in a row doubles, so a dead strategy is only probed occasionally
+            self.trips[name] += 1
+            cooldown = min(self.cooldown * 2 ** (self.trips[name] - 1), self.max_cooldown)
+            self.cooldown_until[name] = now + cooldown
+            return True
+
+    def cooldown_remaining(self, name, now=None):
+        """Seconds until the strategy is tried again, 0 if it is available"""
+        now = now or time.monotonic()
+        with self.lock:
+            return max(self.cooldown_until[name] - now, 0.0)
+
+    def stats(self, now=None):
+        """Per-strategy rank, success rate, latency and remaining cooldown"""
+        now = now or time.monotonic()
+        with self.lock:
+            ranked = sorted(self.strategies, key=lambda name: (self.score(name), self.strategies.index(name)))
+            return {
+                name: {
+                    'rank': ranked.index(name),
+                    'success_rate': self.success_rate(name),
+                    'latency': self.latency(name),
+                    'cooldown': max(self.cooldown_until[name] - now, 0.0),
+                }
+                for name in self.strategies
+            }
+
+
+class SamplingProfiler:
+    """On-demand stack sampler for every thread plus a tracemalloc snapshot over N check cycles"""
+
+    def __init__(self, output_dir, logger, interval=0.005, tracemalloc_frames=25):
+        self.output_dir = output_dir
+        self.logger = logger
+        self.interval = interval
+        self.tracemalloc_frames = tracemalloc_frames
+        self.lock = threading.Lock()
+        self.requested = 0
+        self.signalled = 0
+        self.remaining = 0
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.stacks = Counter()
+        self.samples = 0
+        self.started_tracemalloc = False
+        self.started = 0.0
+
+    def request(self, cycles):
+        """Arm the profiler for the next N cycles; returns False if a capture is already pending"""
+        with self.lock:
+            if self.requested or self.thread:
+                return False
+            self.requested = max(int(cycles), 1)
+            return True
+
+    def request_from_signal(self, cycles):
+        """Arm the profiler from a signal handler, which may interrupt a holder of the lock"""
+        self.signalled = max(int(cycles), 1)
+
+    def cycle_started(self):
+        """Start sampling if a capture was requested; two attribute reads when idle"""
+        if not self.requested and not self.signalled:
+            return
+        with self.lock:
+            # A signal that arrives while a capture is pending or running is dropped, like a refused request
+            if self.signalled and not self.requested and not self.thread:
+                self.requested = self.signalled
+            self.signalled = 0
+            if not self.requested or self.thread:
+                return
+            self.remaining, self.requested = self.requested, 0
+            self.stacks = Counter()
+            self.samples = 0
+            self.stop_event.clear()
+            self.started_tracemalloc = not tracemalloc.is_tracing()
+            if self.started_tracemalloc:
+                tracemalloc.start(self.tracemalloc_frames)
+            self.started = time.time()
+            self.thread = threading.Thread(target=self.sample, name='profiler', daemon=True)
+            self.thread.start()
+        self.logger.info(f"🔬 Profiling the next {self.remaining} cycles")
+
+    def cycle_finished(self):
+        """Count a finished cycle and write the capture after the last one"""
+        if not self.thread:
+            return
+        with self.lock:
+            self.remaining -= 1
+            if self.remaining > 0:
+                return
+        self.finish()
+
+    def finish(self):
+        """Stop sampling and write the capture, even if fewer cycles ran than requested"""
+        with self.lock:
+            thread, self.thread = self.thread, None
+            self.requested = 0
+        if thread is None:
+            return
+        
+        self.stop_event.set()
+        thread.join()
+        snapshot = tracemalloc.take_snapshot()
+        if self.started_tracemalloc:
+            tracemalloc.stop()
+        paths = self.write(snapshot)
+        self.logger.info(f"🔬 Profile written: {', '.join(paths)}")
+
+    def sample(self):
+        """Record the stack of every other thread until stopped"""
+        own = threading.get_ident()
+        while not self.stop_event.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def write(self, snapshot):
+        """Write collapsed stacks, a top-functions report and the tracemalloc snapshot"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(self.output_dir, f"profile-{datetime.fromtimestamp(self.started).strftime('%Y%m%d-%H%M%S')}")
+        
+        # Collapsed stacks load directly into flamegraph.pl or speedscope
+        with open(f"{base}.collapsed", 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        
+        own = Counter()
+        total = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(';')[1:]
+            if frames:
+                own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+        
+        thread_samples = sum(self.stacks.values()) or 1
+        with open(f"{base}-top.txt", 'w') as f:
+            f.write(f"{self.samples} samples every {self.interval * 1000:.0f}ms over "
+                    f"{time.time() - self.started:.1f}s, {thread_samples} thread samples\n\n")
+            f.write("Top functions by own samples\n")
+            for frame, count in own.most_common(30):
+                f.write(f"{count / thread_samples:7.1%}  {frame}\n")
+            f.write("\nTop functions including callees\n")
+            for frame, count in total.most_common(30):
+                f.write(f"{count / thread_samples:7.1%}  {frame}\n")
+        
+        snapshot.dump(f"{base}.tracemalloc")
+        with open(f"{base}-memory.txt", 'w') as f:
+            for stat in snapshot.statistics('lineno')[:30]:
+                f.write(f"{stat}\n")
+        
+        return [f"{base}.collapsed", f"{base}-top.txt", f"{base}.tracemalloc", f"{base}-memory.txt"]
+
+
+class StockStreamScanner:
+    """Incremental out-of-stock marker scan over decoded chunks of a response body"""
+
+    def __init__(self):
+        self.keep = max(len(STREAM_CONTAINER_MARKER), len(STREAM_OUT_OF_STOCK_MARKER),
+                        *(len(marker) for marker in STREAM_CHALLENGE_MARKERS)) - 1
+        self.tail = ''
+        self.container_seen = False
+        self.out_of_stock = False
+        self.challenge = False
+
+    def feed(self, text):
+        """Scan the next chunk and return True once the page is decisively out of stock"""
+        window = self.tail + text.lower()
+
+        if any(marker in window for marker in STREAM_CHALLENGE_MARKERS):
+            self.challenge = True
+
+        if not self.container_seen:
+            index = window.find(STREAM_CONTAINER_MARKER)
+            if index >= 0:
+                self.container_seen = True
+                window = window[index + len(STREAM_CONTAINER_MARKER):]
+
+        if self.container_seen and STREAM_OUT_OF_STOCK_MARKER in window:
+            self.out_of_stock = True
+
+        self.tail = window[-self.keep:]
+        return self.out_of_stock
+
+
 class PopmartMonitor:
     def __init__(self, config_file='config.json'):
         self.config_file = config_file
+        self.setup_logging()
         self.config = self.load_config()
-        self.session = cloudscraper.create_scraper()
+        self.config['products'] = load_products(self.config.get('products', []))
         self.driver = None
         self.ua = UserAgent()
-        self.setup_logging()
         self.last_check_time = {}
+        self.listing_products = {}
+
+        monitoring_config = self.config.get('monitoring', {})
+        self.max_concurrent_checks = max(int(monitoring_config.get('max_concurrent_checks', 5)), 1)
+        self.rate_limiter = HostRateLimiter(
+            monitoring_config.get('requests_per_minute_per_host', 30),
+            burst=self.max_concurrent_checks
+        )
+        self.session_pool = SessionPool(
+            max_connections=monitoring_config.get('max_connections_per_host', self.max_concurrent_checks),
+            idle_timeout=monitoring_config.get('session_idle_timeout_seconds', 300)
+        )
+        self.page_cache = PageCache()
+        self.fetch_strategies = self.create_fetch_strategies()
+        metrics_config = self.config.get('metrics', {})
+        self.metrics = MetricsRegistry()
+        self.metrics.add_collector(self.collect_metrics)
+        self.metrics_per_product = metrics_config.get('per_product', True)
+        self.metrics_server = None
+        self.metrics_summary_interval = metrics_config.get('log_summary_minutes', 15) * 60
+        self.metrics_summary_due = time.time() + self.metrics_summary_interval
+        profiling_config = self.config.get('profiling', {})
+        self.profiler = SamplingProfiler(
+            profiling_config.get('output_dir', 'profiles'),
+            self.logger,
+            interval=profiling_config.get('sample_interval_ms', 5) / 1000,
+            tracemalloc_frames=profiling_config.get('tracemalloc_frames', 25)
+        )
+        self.classifier = PageClassifier()
+        self.fingerprints = ContentFingerprints()
+        self.state_store = ProductStateStore(monitoring_config.get('state_file', 'popmart_state.db'))
+        notifications_config = self.config.get('notifications', {})
+        self.dispatcher = DiscordDispatcher(
+            self.config.get('discord_webhook_url'),
+            self.logger,
+            max_queue=notifications_config.get('max_queue', 1000),
+            batch_window=notifications_config.get('batch_window_seconds', 1.0)
+        )
+        self.dispatcher.start()
+        selenium_config = self.config.get('selenium', {})
+        self.scheduler = ProductScheduler()
+        self.scheduler_stats = {'batches': 0, 'overruns': 0, 'last_lateness': 0.0, 'max_lateness': 0.0}
+        self.request_budget = self.create_request_budget()
+        self.stop_event = threading.Event()
+        self.reload_requested = False
+        self.config_signature = self.config_file_signature()
+        self.config_reload_due = time.time()
+        self.resource_stats = {'pages': 0, 'bytes': 0, 'blocked': 0}
+        self.resource_stats_lock = threading.Lock()
+        self.browser_pool = BrowserPool(self.create_driver, selenium_config.get('pool_size', 2), self.logger)
+        self.parse_pool_min_bytes = self.config.get('parsing', {}).get('min_page_bytes', 65536)
+        self.parse_pool = self.create_parse_pool()
+        self.warm_start()
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrent_checks,
+            thread_name_prefix='check'
+        )
         
     def setup_logging(self):
         """Setup logging configuration"""
@@ -52,12 +2328,241 @@ class PopmartMonitor:
     def load_config(self):
         """Load configuration from JSON file"""
         try:
-            with open(self.config_file, 'r') as f:
-                return json.load(f)
+            return self.read_config()
         except FileNotFoundError:
             self.logger.error(f"Config file {self.config_file} not found!")
             return self.create_default_config()
 
+    def read_config(self):
+        """Parse the config file; raises OSError or ValueError"""
+        with open(self.config_file, 'r') as f:
+            return json.load(f)
+
+    def create_fetch_strategies(self):
+        """Fetch strategy selector for the cloudflare settings"""
+        cloudflare_config = self.config.get('cloudflare', {})
+        return FetchStrategySelector(
+            [name for name in FETCH_STRATEGIES
+             if name != 'selenium' or cloudflare_config.get('use_selenium_fallback', True)],
+            window=cloudflare_config.get('strategy_window', 20),
+            failure_threshold=cloudflare_config.get('strategy_failure_threshold', 3),
+            cooldown=cloudflare_config.get('strategy_cooldown_seconds', 300),
+            max_cooldown=cloudflare_config.get('strategy_max_cooldown_seconds', 3600),
+            adaptive=cloudflare_config.get('adaptive_strategy_order', True)
+        )
+
+    def create_request_budget(self):
+        """Request budget for the monitoring settings, or None when it is disabled"""
+        monitoring_config = self.config.get('monitoring', {})
+        budget_config = monitoring_config.get('request_budget', {})
+        if not budget_config.get('enabled', False):
+            return None
+        max_minutes = monitoring_config.get('max_check_interval_minutes')
+        return RequestBudget(
+            budget_config.get('requests_per_minute', 20),
+            min_interval=budget_config.get('min_interval_seconds', 30),
+            max_interval=max_minutes * 60 if max_minutes else None,
+            change_half_life_hours=budget_config.get('change_half_life_hours', 24),
+            error_window=budget_config.get('error_window', 20)
+        )
+
+    def create_parse_pool(self):
+        """Parse worker pool for the parsing settings, or None when parsing stays in process"""
+        parsing_config = self.config.get('parsing', {})
+        if not parsing_config.get('process_pool', True):
+            return None
+        workers = parsing_config.get('workers') or min(os.cpu_count() or 1, 4)
+        return ParsePool(
+            workers,
+            parsing_config.get('max_pending', workers * 2),
+            cpu_affinity=parsing_config.get('cpu_affinity'),
+            logger=self.logger
+        )
+
+    def config_file_signature(self):
+        """Modification time and size of the config file, or None if it cannot be read"""
+        try:
+            stat = os.stat(self.config_file)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def reload_config_if_changed(self):
+        """Reload the config when the file changed or a reload was requested by signal"""
+        interval = self.config.get('monitoring', {}).get('config_reload_seconds', 5)
+        if not self.reload_requested and (not interval or time.time() < self.config_reload_due):
+            return False
+        self.config_reload_due = time.time() + (interval or 0)
+        
+        signature = self.config_file_signature()
+        if not self.reload_requested and (signature is None or signature == self.config_signature):
+            return False
+        self.reload_requested = False
+        # Remember the signature even for a bad edit so it is reported once, not on every poll
+        self.config_signature = signature
+        return self.reload_config()
+
+    def reload_config(self):
+        """Validate the config file and apply what changed; the running config is kept on any error"""
+        try:
+            new_config = self.read_config()
+        except (OSError, ValueError) as e:
+            self.logger.error(f"⚙️ Config reload skipped, could not read {self.config_file}: {e}")
+            self.metrics.inc('popmart_config_reloads_total', result='invalid')
+            return False
+        
+        errors = validate_config(new_config)
+        if errors:
+            self.logger.error(f"⚙️ Config reload skipped, {self.config_file} is invalid: {'; '.join(errors)}")
+            self.metrics.inc('popmart_config_reloads_total', result='invalid')
+            return False
+        
+        new_config['products'] = load_products(new_config.get('products', []))
+        diff = diff_config(self.config, new_config)
+        if not (diff['added'] or diff['removed'] or diff['changed'] or diff['settings']):
+            return False
+        
+        old_config = self.config
+        self.config = new_config
+        try:
+            # Everything that can fail to build is built before any running resource is replaced
+            resources = self.build_config_resources(diff['settings'])
+        except Exception as e:
+            self.config = old_config
+            self.logger.error(f"⚙️ Config reload failed, keeping the previous config: {e}")
+            self.metrics.inc('popmart_config_reloads_total', result='failed')
+            return False
+        
+        previous = self.swap_config_resources(resources)
+        try:
+            self.apply_config_settings(diff['settings'])
+            self.apply_product_changes(diff)
+        except Exception as e:
+            self.config = old_config
+            self.close_config_resources(self.swap_config_resources(previous))
+            self.apply_config_settings(diff['settings'])
+            for product in diff['added']:
+                self.scheduler.remove(product.url)
+            self.schedule_products()
+            self.logger.error(f"⚙️ Config reload failed, keeping the previous config: {e}")
+            self.metrics.inc('popmart_config_reloads_total', result='failed')
+            return False
+        
+        self.close_config_resources(previous)
+        self.metrics.inc('popmart_config_reloads_total', result='applied')
+        self.logger.info(f"⚙️ Config reloaded: {len(diff['added'])} products added, {len(diff['removed'])} removed, "
+                         f"{len(diff['changed'])} changed, settings changed: {', '.join(diff['settings']) or 'none'}")
+        return True
+
+    def build_config_resources(self, changed):
+        """Build replacements for the resources sized by the changed settings, leaving the running ones alone"""
+        resources = {}
+        try:
+            if settings_touched(changed, 'monitoring.max_concurrent_checks'):
+                workers = max(int(self.config.get('monitoring', {}).get('max_concurrent_checks', 5)), 1)
+                resources['executor'] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='check')
+            if settings_touched(changed, 'monitoring.request_budget', 'monitoring.max_check_interval_minutes'):
+                resources['request_budget'] = self.create_request_budget()
+            if settings_touched(changed, 'cloudflare.use_selenium_fallback', 'cloudflare.adaptive_strategy_order',
+                                'cloudflare.strategy_window', 'cloudflare.strategy_failure_threshold',
+                                'cloudflare.strategy_cooldown_seconds', 'cloudflare.strategy_max_cooldown_seconds'):
+                resources['fetch_strategies'] = self.create_fetch_strategies()
+            if settings_touched(changed, 'parsing.process_pool', 'parsing.workers', 'parsing.max_pending',
+                                'parsing.cpu_affinity'):
+                resources['parse_pool'] = self.create_parse_pool()
+            if settings_touched(changed, 'metrics.enabled', 'metrics.host', 'metrics.port'):
+                resources['metrics_server'] = self.create_metrics_server()
+        except Exception:
+            self.close_config_resources(resources)
+            raise
+        return resources
+
+    def swap_config_resources(self, resources):
+        """Put the given resources in place and return the ones they replaced"""
+        previous = {name: getattr(self, name) for name in resources}
+        for name, resource in resources.items():
+            setattr(self, name, resource)
+        return previous
+
+    def close_config_resources(self, resources):
+        """Release resources that were replaced or never put in place"""
+        # Reloads run between batches, so no check is running on a replaced executor
+        if resources.get('executor'):
+            resources['executor'].shutdown(wait=False)
+        if resources.get('parse_pool'):
+            resources['parse_pool'].close()
+        if resources.get('metrics_server'):
+            resources['metrics_server'].shutdown()
+            resources['metrics_server'].server_close()
+
+    def apply_config_settings(self, changed):
+        """Retune the live objects whose settings changed; the rest are read live"""
+        monitoring_config = self.config.get('monitoring', {})
+        if settings_touched(changed, 'monitoring.max_concurrent_checks', 'monitoring.requests_per_minute_per_host'):
+            self.max_concurrent_checks = max(int(monitoring_config.get('max_concurrent_checks', 5)), 1)
+            self.rate_limiter.configure(monitoring_config.get('requests_per_minute_per_host', 30),
+                                        self.max_concurrent_checks)
+        if settings_touched(changed, 'monitoring.max_connections_per_host',
+                            'monitoring.session_idle_timeout_seconds'):
+            self.session_pool.close()
+            self.session_pool.max_connections = max(int(monitoring_config.get(
+                'max_connections_per_host', self.max_concurrent_checks)), 1)
+            self.session_pool.idle_timeout = monitoring_config.get('session_idle_timeout_seconds', 300)
+        
+        notifications_config = self.config.get('notifications', {})
+        self.dispatcher.batch_window = notifications_config.get('batch_window_seconds', 1.0)
+        if settings_touched(changed, 'notifications.max_queue'):
+            self.dispatcher.resize(notifications_config.get('max_queue', 1000))
+        
+        metrics_config = self.config.get('metrics', {})
+        self.metrics_per_product = metrics_config.get('per_product', True)
+        if settings_touched(changed, 'metrics.log_summary_minutes'):
+            self.metrics_summary_interval = metrics_config.get('log_summary_minutes', 15) * 60
+            self.metrics_summary_due = time.time() + self.metrics_summary_interval
+        
+        profiling_config = self.config.get('profiling', {})
+        self.profiler.output_dir = profiling_config.get('output_dir', 'profiles')
+        self.profiler.interval = profiling_config.get('sample_interval_ms', 5) / 1000
+        self.profiler.tracemalloc_frames = profiling_config.get('tracemalloc_frames', 25)
+        
+        self.parse_pool_min_bytes = self.config.get('parsing', {}).get('min_page_bytes', 65536)
+        
+        restart = [key for key in changed if settings_touched([key], *RESTART_REQUIRED_SETTINGS)]
+        if restart:
+            self.logger.warning(f"⚙️ These settings take effect after a restart: {', '.join(restart)}")
+
+    def apply_product_changes(self, diff):
+        """Update the scheduler for added, removed and changed products"""
+        for url in diff['removed']:
+            self.scheduler.remove(url)
+        
+        interval_settings = ('monitoring.check_interval_minutes', 'monitoring.max_check_interval_minutes',
+                             'monitoring.random_delay')
+        if any(key in interval_settings or key.startswith('monitoring.request_budget') for key in diff['settings']):
+            # Every product's interval may have moved, not just the edited ones
+            self.schedule_products()
+            return
+        
+        self.allocate_budget()
+        now = time.time()
+        for product in diff['added'] + diff['changed']:
+            self.schedule_product(product, now)
+
+    def install_reload_signal(self):
+        """Reload the config immediately when the process receives SIGHUP"""
+        if not hasattr(signal, 'SIGHUP'):
+            return
+        
+        def handle_signal(signum, frame):
+            self.reload_requested = True
+            self.scheduler.wake.set()
+        
+        try:
+            signal.signal(signal.SIGHUP, handle_signal)
+        except ValueError:
+            # signal handlers can only be installed from the main thread
+            pass
+
     def create_default_config(self):
         """Create default configuration file"""
         default_config = {
@@ -77,12 +2582,84 @@ class PopmartMonitor:
                 "check_interval_minutes": 2,
                 "max_check_interval_minutes": 5,
                 "random_delay": True,
-                "human_behavior": True
+                "human_behavior": True,
+                "max_concurrent_checks": 5,
+                "requests_per_minute_per_host": 30,
+                "max_connections_per_host": 5,
+                "session_idle_timeout_seconds": 300,
+                "streaming_detection": True,
+                "state_file": "popmart_state.db",
+                "embedded_json": True,
+                "config_reload_seconds": 5,
+                "request_budget": {
+                    "enabled": False,
+                    "requests_per_minute": 20,
+                    "min_interval_seconds": 30,
+                    "change_half_life_hours": 24,
+                    "error_window": 20
+                }
             },
             "cloudflare": {
                 "max_retries": 3,
                 "retry_delay": 10,
-                "use_selenium_fallback": True
+                "use_selenium_fallback": True,
+                "adaptive_strategy_order": True,
+                "strategy_window": 20,
+                "strategy_failure_threshold": 3,
+                "strategy_cooldown_seconds": 300,
+                "strategy_max_cooldown_seconds": 3600
+            },
+            "listings": {
+                "urls": [],
+                "confirm_restocks": True
+            },
+            "notifications": {
+                "max_queue": 1000,
+                "batch_window_seconds": 1.0
+            },
+            "metrics": {
+                "enabled": True,
+                "host": "127.0.0.1",
+                "port": 9108,
+                "per_product": True,
+                "log_summary_minutes": 15
+            },
+            "profiling": {
+                "signal": True,
+                "cycles": 3,
+                "output_dir": "profiles",
+                "sample_interval_ms": 5,
+                "tracemalloc_frames": 25
+            },
+            "parsing": {
+                "process_pool": True,
+                "workers": 2,
+                "max_pending": 4,
+                "min_page_bytes": 65536,
+                "cpu_affinity": []
+            },
+            "sharding": {
+                "bind": "127.0.0.1:9200",
+                "authkey": "",
+                "workers": 2,
+                "ring_replicas": 100,
+                "heartbeat_seconds": 5,
+                "heartbeat_timeout_seconds": 20,
+                "restart_workers": True,
+                "state_file": "popmart_coordinator.db"
+            },
+            "selenium": {
+                "pool_size": 2,
+                "prewarm": True,
+                "block_resources": True,
+                "block_resource_types": ["image", "font", "media"],
+                "block_url_patterns": [
+                    "*google-analytics.com*",
+                    "*googletagmanager.com*",
+                    "*doubleclick.net*",
+                    "*facebook.net*",
+                    "*hotjar.com*"
+                ]
             }
         }
         
@@ -94,7 +2671,13 @@ class PopmartMonitor:
         return default_config
 
     def setup_selenium(self):
-        """Setup Chrome driver with multiple fallback strategies"""
+        """Setup the Chrome driver used for login"""
+        self.driver = self.create_driver()
+        return self.driver is not None
+
+    def create_driver(self):
+        """Create a Chrome driver with multiple fallback strategies"""
+        driver = None
         try:
             # Strategy 1: Try undetected-chromedriver with better settings
             try:
@@ -111,8 +2694,6 @@ class PopmartMonitor:
                 options.add_argument('--disable-web-security')
                 options.add_argument('--allow-running-insecure-content')
                 options.add_argument('--disable-extensions')
-                options.add_argument('--disable-plugins')
-                options.add_argument('--disable-images')
                 options.add_argument('--disable-default-apps')
                 options.add_argument('--no-first-run')
                 options.add_argument('--disable-background-timer-throttling')
@@ -121,9 +2702,10 @@ class PopmartMonitor:
                 
                 # User agent rotation
                 options.add_argument(f'--user-agent={self.ua.random}')
+                options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
                 
                 # Try to create driver with timeout
-                self.driver = uc.Chrome(
+                driver = uc.Chrome(
                     options=options, 
                     version_main=None,
                     driver_executable_path=None,
@@ -132,20 +2714,21 @@ class PopmartMonitor:
                 )
                 
                 # Quick test
-                self.driver.set_page_load_timeout(30)
-                self.driver.get("data:text/html,<html><body>Test</body></html>")
+                driver.set_page_load_timeout(30)
+                self.apply_resource_blocking(driver)
+                driver.get("data:text/html,<html><body>Test</body></html>")
                 
                 self.logger.info("Undetected Chrome driver setup successful")
-                return True
+                return driver
                 
             except Exception as uc_error:
                 self.logger.warning(f"Undetected Chrome failed: {uc_error}")
-                if self.driver:
+                if driver:
                     try:
-                        self.driver.quit()
+                        driver.quit()
                     except:
                         pass
-                    self.driver = None
+                    driver = None
             
             # Strategy 2: Regular Selenium with WebDriver Manager
             try:
@@ -163,10 +2746,9 @@ class PopmartMonitor:
                 chrome_options.add_argument('--window-size=1920,1080')
                 chrome_options.add_argument('--disable-web-security')
                 chrome_options.add_argument('--disable-extensions')
-                chrome_options.add_argument('--disable-plugins')
-                chrome_options.add_argument('--disable-images')
                 chrome_options.add_argument('--no-first-run')
                 chrome_options.add_argument(f'--user-agent={self.ua.random}')
+                chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
                 
                 # Anti-detection measures
                 chrome_options.add_argument('--disable-blink-features=AutomationControlled')
@@ -176,23 +2758,24 @@ class PopmartMonitor:
                 # Setup service with WebDriver Manager
                 service = Service(ChromeDriverManager().install())
                 
-                self.driver = webdriver.Chrome(service=service, options=chrome_options)
-                self.driver.set_page_load_timeout(30)
+                driver = webdriver.Chrome(service=service, options=chrome_options)
+                driver.set_page_load_timeout(30)
+                self.apply_resource_blocking(driver)
                 
                 # Test the driver
-                self.driver.get("data:text/html,<html><body>Test</body></html>")
+                driver.get("data:text/html,<html><body>Test</body></html>")
                 
                 self.logger.info("Regular Chrome driver setup successful")
-                return True
+                return driver
                 
             except Exception as reg_error:
                 self.logger.warning(f"Regular Selenium failed: {reg_error}")
-                if self.driver:
+                if driver:
                     try:
-                        self.driver.quit()
+                        driver.quit()
                     except:
                         pass
-                    self.driver = None
+                    driver = None
             
             # Strategy 3: Try with system Chrome/Chromium binary
             try:
@@ -224,42 +2807,111 @@ class PopmartMonitor:
                 chrome_options.add_argument('--disable-dev-shm-usage')
                 chrome_options.add_argument('--disable-gpu')
                 chrome_options.add_argument('--headless=new')
-                chrome_options.add_argument('--remote-debugging-port=9222')
+                chrome_options.add_argument('--remote-debugging-port=0')
                 chrome_options.add_argument('--disable-web-security')
                 chrome_options.add_argument('--disable-features=VizDisplayCompositor')
                 chrome_options.add_argument(f'--user-agent={self.ua.random}')
+                chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
                 
-                self.driver = webdriver.Chrome(options=chrome_options)
-                self.driver.set_page_load_timeout(30)
-                self.driver.get("data:text/html,<html><body>Test</body></html>")
+                driver = webdriver.Chrome(options=chrome_options)
+                driver.set_page_load_timeout(30)
+                self.apply_resource_blocking(driver)
+                driver.get("data:text/html,<html><body>Test</body></html>")
                 
                 self.logger.info(f"System Chrome/Chromium driver setup successful with {chrome_binary}")
-                return True
+                return driver
                 
             except Exception as sys_error:
                 self.logger.warning(f"System Chrome/Chromium failed: {sys_error}")
-                if self.driver:
+                if driver:
                     try:
-                        self.driver.quit()
+                        driver.quit()
                     except:
                         pass
-                    self.driver = None
+                    driver = None
             
             # Execute stealth scripts if we have a working driver
-            if self.driver:
+            if driver:
                 try:
-                    self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
-                    self.driver.execute_script("Object.defineProperty(navigator, 'plugins', {get: () => [1, 2, 3, 4, 5]})")
-                    self.driver.execute_script("Object.defineProperty(navigator, 'languages', {get: () => ['en-US', 'en']})")
+                    driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+                    driver.execute_script("Object.defineProperty(navigator, 'plugins', {get: () => [1, 2, 3, 4, 5]})")
+                    driver.execute_script("Object.defineProperty(navigator, 'languages', {get: () => ['en-US', 'en']})")
                 except Exception:
                     pass
-                return True
+                return driver
             
         except Exception as e:
             self.logger.error(f"All Chrome driver strategies failed: {e}")
         
         self.logger.error("Failed to setup any Chrome driver - will continue with CloudScraper only")
-        return False
+        return None
+
+    def resource_block_patterns(self):
+        """URL patterns to block, from the configured resource types and URL patterns"""
+        selenium_config = self.config.get('selenium', {})
+        patterns = []
+        for resource_type in selenium_config.get('block_resource_types', DEFAULT_BLOCKED_RESOURCE_TYPES):
+            patterns.extend(RESOURCE_TYPE_PATTERNS.get(resource_type, []))
+        patterns.extend(selenium_config.get('block_url_patterns', DEFAULT_BLOCKED_URL_PATTERNS))
+        return patterns
+
+    def apply_resource_blocking(self, driver):
+        """Block unneeded requests in the browser through DevTools network interception"""
+        if not self.config.get('selenium', {}).get('block_resources', True):
+            return False
+        
+        patterns = self.resource_block_patterns()
+        try:
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': patterns})
+            self.logger.info(f"Resource blocking enabled with {len(patterns)} URL patterns")
+            return True
+        except Exception as e:
+            self.logger.warning(f"Could not enable resource blocking: {e}")
+            return False
+
+    def resource_report(self, driver, started):
+        """Summarise transferred bytes, blocked requests and load time for the last page"""
+        report = {'requests': 0, 'bytes': 0, 'blocked': {}, 'load_seconds': time.time() - started}
+        try:
+            entries = driver.get_log('performance')
+        except Exception:
+            return report
+        
+        for entry in entries:
+            try:
+                message = json.loads(entry['message'])['message']
+            except (KeyError, ValueError):
+                continue
+            method = message.get('method')
+            params = message.get('params', {})
+            if method == 'Network.loadingFinished':
+                report['requests'] += 1
+                report['bytes'] += int(params.get('encodedDataLength', 0))
+            elif method == 'Network.loadingFailed' and params.get('blockedReason'):
+                resource_type = params.get('type', 'Other')
+                report['blocked'][resource_type] = report['blocked'].get(resource_type, 0) + 1
+        
+        with self.resource_stats_lock:
+            self.resource_stats['pages'] += 1
+            self.resource_stats['bytes'] += report['bytes']
+            self.resource_stats['blocked'] += sum(report['blocked'].values())
+        return report
+
+    def warm_start(self):
+        """Seed in-memory state from the persistent store after a restart"""
+        for url, state in self.state_store.states.items():
+            if state.last_seen:
+                self.last_check_time[url] = state.last_seen
+            if state.fingerprint and state.last_seen:
+                self.fingerprints.store(url, state.fingerprint, ProductInfo(
+                    state.name or '', state.price or '', state.in_stock, state.image_url or '', url
+                ))
+        
+        if self.state_store.states:
+            in_stock = sum(1 for state in self.state_store.states.values() if state.in_stock)
+            self.logger.info(f"Warm start: loaded state for {len(self.state_store.states)} products "
+                             f"({in_stock} in stock)")
 
     def human_behavior_delay(self):
         """Add random human-like delays"""
@@ -282,215 +2934,241 @@ class PopmartMonitor:
                 pass
 
     def send_discord_notification(self, title, description, color=0x00ff00, fields=None, image_url=None):
-        """Send notification to Discord"""
+        """Queue a notification for the background Discord dispatcher"""
+        return self.send_embed(build_embed(title, description, color, fields, image_url))
+
+    @span('send_discord_notification')
+    def send_embed(self, embed, on_failure=None):
+        """Queue a prepared embed for the background Discord dispatcher"""
         webhook_url = self.config.get('discord_webhook_url')
         if not webhook_url:
             self.logger.error("Discord webhook URL not configured!")
             return False
+        
+        self.dispatcher.webhook_url = webhook_url
+        return self.dispatcher.submit(embed, on_failure)
 
-        try:
-            webhook = DiscordWebhook(url=webhook_url)
-            embed = DiscordEmbed(title=title, description=description, color=color)
-            embed.set_timestamp()
-            
-            if fields:
-                for field in fields:
-                    embed.add_embed_field(
-                        name=field.get('name', ''),
-                        value=field.get('value', ''),
-                        inline=field.get('inline', False)
-                    )
+    @span('handle_cloudflare_challenge')
+    def handle_cloudflare_challenge(self, url):
+        """Handle Cloudflare challenges and 403 blocks by trying fetch strategies best-first"""
+        self.logger.info(f"Fetching content from: {url}")
+        
+        strategies, skipped = self.fetch_strategies.order()
+        for name in skipped:
+            self.metrics.inc('popmart_fetch_attempts_total', strategy=name, outcome='skipped')
+        if skipped:
+            self.logger.info(f"Skipping fetch strategies in cooldown: {', '.join(skipped)}")
+        self.metrics.inc('popmart_strategy_first_total', strategy=strategies[0])
+        
+        previous = None
+        for name in strategies:
+            # Add random delay between back-to-back CloudScraper attempts
+            if previous and previous.startswith('cloudscraper') and name.startswith('cloudscraper'):
+                time.sleep(random.uniform(2, 5))
+            previous = name
             
-            if image_url:
-                embed.set_image(url=image_url)
+            started = time.perf_counter()
+            content = self.run_fetch_strategy(name, url)
+            elapsed = time.perf_counter() - started
             
-            webhook.add_embed(embed)
-            response = webhook.execute()
+            self.metrics.observe('popmart_fetch_seconds', elapsed, strategy=name)
+            if not name.startswith('cloudscraper'):
+                self.metrics.inc('popmart_fetch_attempts_total', strategy=name,
+                                 outcome='success' if content is not None else 'failed')
+            if self.fetch_strategies.record(name, content is not None, elapsed):
+                cooldown = self.fetch_strategies.cooldown_remaining(name)
+                self.logger.warning(f"Fetch strategy {name} keeps failing, skipping it for {cooldown:.0f}s")
             
-            if response.status_code == 200:
-                self.logger.info(f"Discord notification sent: {title}")
-                return True
-            else:
-                self.logger.error(f"Failed to send Discord notification: {response.status_code}")
-                return False
-                
-        except Exception as e:
-            self.logger.error(f"Error sending Discord notification: {e}")
-            return False
-
-    def handle_cloudflare_challenge(self, url):
-        """Handle Cloudflare challenges and 403 blocks using multiple methods"""
-        self.logger.info(f"Fetching content from: {url}")
+            if content is not None:
+                return content
         
-        # Method 1: Enhanced CloudScraper with rotating strategies
-        for attempt in range(3):
-            try:
-                self.logger.info(f"CloudScraper attempt {attempt + 1}/3")
-                
-                # Create new scraper for each attempt
-                scraper = cloudscraper.create_scraper(
+        self.logger.error("All content fetching methods failed")
+        return None
+
+    def run_fetch_strategy(self, name, url):
+        """Fetch the URL with one named strategy; returns a response, page source or None"""
+        if name.startswith('cloudscraper_'):
+            return self.fetch_with_cloudscraper(url, name[len('cloudscraper_'):])
+        if name == 'selenium':
+            self.logger.info("Trying Selenium...")
+            return self.fetch_with_selenium(url)
+        return self.try_simple_requests(url)
+
+    def fetch_with_cloudscraper(self, url, platform):
+        """One CloudScraper attempt with the scraper and header set for the given platform"""
+        strategy = f"cloudscraper_{platform}"
+        attempt = FETCH_STRATEGIES.index(strategy)
+        try:
+            self.logger.info(f"CloudScraper attempt ({platform})")
+            
+            # Reuse the pooled scraper for this platform so warm connections carry over
+            scraper = self.session_pool.get(
+                url,
+                ('cloudscraper', platform),
+                lambda: cloudscraper.create_scraper(
                     browser={
                         'browser': 'chrome',
-                        'platform': 'linux' if attempt == 0 else 'windows' if attempt == 1 else 'darwin',
+                        'platform': platform,
                         'desktop': True
                     },
                     delay=random.uniform(1, 3),
                     debug=False
                 )
-                
-                # Rotate headers for each attempt
-                headers_sets = [
-                    {
-                        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
-                        'Accept-Language': 'en-US,en;q=0.5',
-                        'Accept-Encoding': 'gzip, deflate, br',
-                        'DNT': '1',
-                        'Connection': 'keep-alive',
-                        'Upgrade-Insecure-Requests': '1',
-                        'Sec-Fetch-Site': 'none',
-                        'Sec-Fetch-Mode': 'navigate',
-                        'Sec-Fetch-User': '?1',
-                        'Cache-Control': 'max-age=0',
-                    },
-                    {
-                        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-                        'Accept-Language': 'en-US,en;q=0.9',
-                        'Accept-Encoding': 'gzip, deflate, br',
-                        'Connection': 'keep-alive',
-                        'Upgrade-Insecure-Requests': '1',
-                        'User-Agent': self.ua.random,
-                    },
-                    {
-                        'Accept': '*/*',
-                        'Accept-Language': 'en-US,en;q=0.5',
-                        'Connection': 'keep-alive',
-                        'User-Agent': self.ua.random,
-                    }
-                ]
-                
-                headers = headers_sets[attempt]
-                
-                # Add random delay between attempts
-                if attempt > 0:
-                    time.sleep(random.uniform(2, 5))
-                
+            )
+            
+            # Each platform's attempt uses its own header set
+            headers_sets = [
+                {
+                    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
+                    'Accept-Language': 'en-US,en;q=0.5',
+                    'Accept-Encoding': 'gzip, deflate, br',
+                    'DNT': '1',
+                    'Connection': 'keep-alive',
+                    'Upgrade-Insecure-Requests': '1',
+                    'Sec-Fetch-Site': 'none',
+                    'Sec-Fetch-Mode': 'navigate',
+                    'Sec-Fetch-User': '?1',
+                    'Cache-Control': 'max-age=0',
+                },
+                {
+                    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+                    'Accept-Language': 'en-US,en;q=0.9',
+                    'Accept-Encoding': 'gzip, deflate, br',
+                    'Connection': 'keep-alive',
+                    'Upgrade-Insecure-Requests': '1',
+                    'User-Agent': self.ua.random,
+                },
+                {
+                    'Accept': '*/*',
+                    'Accept-Language': 'en-US,en;q=0.5',
+                    'Connection': 'keep-alive',
+                    'User-Agent': self.ua.random,
+                }
+            ]
+            
+            headers = dict(headers_sets[attempt])
+            headers.update(self.page_cache.conditional_headers(url))
+            
+            self.rate_limiter.acquire(url)
+            with self.session_pool.slot(url):
                 response = scraper.get(url, headers=headers, timeout=30, allow_redirects=True)
-                
-                self.logger.info(f"CloudScraper response: {response.status_code}")
-                
-                if response.status_code == 200:
-                    # Validate content quality
-                    content_checks = [
-                        len(response.text) > 1000,
-                        "cf-browser-verification" not in response.text.lower(),
-                        "checking your browser" not in response.text.lower(),
-                        "popmart" in response.text.lower() or "labubu" in response.text.lower()
-                    ]
-                    
-                    if all(content_checks[:2]) and any(content_checks[2:]):  # At least basic checks + one content check
-                        self.logger.info("CloudScraper succeeded with valid content")
-                        return response
-                    else:
-                        self.logger.warning(f"CloudScraper got low-quality content (length: {len(response.text)})")
-                        
-                elif response.status_code == 403:
-                    self.logger.warning(f"CloudScraper blocked (403) - attempt {attempt + 1}")
-                    # Try different scraper configuration on 403
-                    continue
-                    
-                else:
-                    self.logger.warning(f"CloudScraper returned status {response.status_code}")
-                    
-            except Exception as e:
-                self.logger.warning(f"CloudScraper attempt {attempt + 1} failed: {e}")
-                continue
-
-        # Method 2: Selenium approach (only if CloudScraper completely failed)
-        if self.config.get('cloudflare', {}).get('use_selenium_fallback', True):
-            self.logger.info("All CloudScraper attempts failed, trying Selenium...")
             
-            try:
-                # Setup driver if not already done
-                if not self.driver:
-                    self.logger.info("Setting up Selenium driver...")
-                    if not self.setup_selenium():
-                        self.logger.error("Could not setup any Selenium driver")
-                        return self.try_simple_requests(url)
-                
-                # Navigate with error handling
-                self.logger.info("Navigating to URL with Selenium...")
-                self.driver.get(url)
-                
-                # Wait and check for challenges
-                initial_wait = random.uniform(3, 6)
-                time.sleep(initial_wait)
-                
-                max_wait = 45  # Increased timeout
-                start_time = time.time()
+            self.logger.info(f"CloudScraper response: {response.status_code}")
+            
+            if response.status_code == 200:
+                # Validate content quality with a single classification of the raw body
+                page = self.classifier.classify(response.content)
+                response.page_class = page
                 
-                while time.time() - start_time < max_wait:
-                    try:
-                        page_source = self.driver.page_source
-                        
-                        # Check challenge indicators
-                        challenge_indicators = [
-                            "cf-browser-verification",
-                            "checking your browser", 
-                            "please wait",
-                            "ddos protection",
-                            "security check"
-                        ]
-                        
-                        in_challenge = any(indicator in page_source.lower() for indicator in challenge_indicators)
-                        
-                        if in_challenge:
-                            self.logger.info(f"Selenium waiting for challenge... ({int(time.time() - start_time)}s)")
-                            time.sleep(3)
-                            continue
-                        
-                        # Check for valid content
-                        if len(page_source) > 1000:
-                            content_indicators = ["popmart", "labubu", "add to bag", "notify me when available"]
-                            has_content = any(indicator in page_source.lower() for indicator in content_indicators)
-                            
-                            if has_content:
-                                self.logger.info("Selenium succeeded - got valid Popmart content")
-                                return page_source
-                            elif "access denied" in page_source.lower() or "403" in page_source:
-                                self.logger.error("Selenium got access denied")
-                                break
-                            else:
-                                self.logger.warning("Selenium got content but quality unclear, waiting...")
-                                time.sleep(2)
-                                continue
-                        
-                        time.sleep(2)
-                        
-                    except Exception as e:
-                        self.logger.warning(f"Error during Selenium wait: {e}")
-                        break
+                if self.is_valid_content(page):
+                    self.logger.info(f"CloudScraper succeeded with valid content ({page.page_type} page)")
+                    self.metrics.inc('popmart_fetch_attempts_total', strategy=strategy, outcome='success')
+                    return response
                 
-                # Final attempt to get content
-                try:
-                    final_content = self.driver.page_source
-                    if len(final_content) > 500:  # Accept minimal content as last resort
-                        self.logger.warning("Selenium timeout, returning available content")
-                        return final_content
-                except Exception:
-                    pass
-                    
-            except Exception as e:
-                self.logger.error(f"Selenium approach completely failed: {e}")
-                # Clean up broken driver
-                if self.driver:
-                    try:
-                        self.driver.quit()
-                    except:
-                        pass
-                    self.driver = None
+                self.logger.warning(f"CloudScraper got low-quality content (length: {page.length}, "
+                                    f"type: {page.page_type})")
+                self.metrics.inc('popmart_fetch_attempts_total', strategy=strategy, outcome='low_quality')
+            
+            elif response.status_code == 304:
+                self.logger.info("CloudScraper: page not modified since last check")
+                self.metrics.inc('popmart_fetch_attempts_total', strategy=strategy, outcome='not_modified')
+                return response
+            
+            elif response.status_code == 403:
+                self.logger.warning(f"CloudScraper blocked (403) - {platform}")
+                self.metrics.inc('popmart_fetch_attempts_total', strategy=strategy, outcome='blocked')
+            
+            else:
+                self.logger.warning(f"CloudScraper returned status {response.status_code}")
+                self.metrics.inc('popmart_fetch_attempts_total', strategy=strategy, outcome='status')
         
-        # Method 3: Simple requests fallback
-        return self.try_simple_requests(url)
+        except Exception as e:
+            self.logger.warning(f"CloudScraper attempt ({platform}) failed: {e}")
+            self.metrics.inc('popmart_fetch_attempts_total', strategy=strategy, outcome='error')
+        
+        return None
+
+    def is_valid_content(self, page):
+        """Check that a fetched page is real, complete Popmart content rather than a challenge, error or stub"""
+        return (page.length > 1000 and page.page_type not in ('challenge', 'blocked')
+                and page.has('brand') and page.has('complete'))
+
+    def fetch_with_selenium(self, url):
+        """Fetch page source through a browser checked out of the pool"""
+        try:
+            with self.browser_pool.page() as driver:
+                if driver is None:
+                    self.logger.error("Could not setup any Selenium driver")
+                    return None
+                return self.load_with_selenium(driver, url)
+        except Exception as e:
+            self.logger.error(f"Selenium approach completely failed: {e}")
+        
+        return None
+
+    def load_with_selenium(self, driver, url):
+        """Load the URL in a checked-out browser and wait for real page content"""
+        # Navigate with error handling
+        self.logger.info("Navigating to URL with Selenium...")
+        self.rate_limiter.acquire(url)
+        try:
+            # Drop performance log entries left over from the previous page on this browser
+            driver.get_log('performance')
+        except Exception:
+            pass
+        load_start = time.time()
+        driver.get(url)
+        
+        # Block until the observer reports a decisive page state instead of polling page_source
+        max_wait = 45
+        start_time = time.time()
+        state = self.wait_for_page_state(driver, max_wait)
+        
+        if state in ('product', 'content', 'login'):
+            page_source = driver.page_source
+            page = self.classifier.classify(page_source)
+            if page.length > 1000 and page.has('content') and not page.has('challenge'):
+                self.logger.info(f"Selenium succeeded - got valid Popmart content ({state}, "
+                                 f"{time.time() - start_time:.1f}s)")
+                report = self.resource_report(driver, load_start)
+                blocked = ', '.join(f"{kind} {count}" for kind, count in sorted(report['blocked'].items()))
+                self.logger.info(f"Selenium page resources: {report['requests']} requests, "
+                                 f"{report['bytes'] / 1024:.0f} KB transferred, "
+                                 f"{sum(report['blocked'].values())} blocked ({blocked or 'none'}), "
+                                 f"load {report['load_seconds']:.1f}s")
+                return page_source
+            self.logger.warning(f"Selenium page reported {state} but content is unclear")
+        elif state == 'denied':
+            self.logger.error("Selenium got access denied")
+        else:
+            self.logger.warning(f"Selenium gave up waiting for page content after {max_wait}s")
+        
+        # Final attempt to get content
+        try:
+            final_content = driver.page_source
+            if len(final_content) > 500:  # Accept minimal content as last resort
+                self.logger.warning("Selenium timeout, returning available content")
+                return final_content
+        except Exception:
+            pass
+        
+        return None
+    
+    def wait_for_page_state(self, driver, max_wait):
+        """Wait for the injected DOM observer to report product, content, login or denied"""
+        slice_seconds = 5
+        driver.set_script_timeout(slice_seconds + 5)
+        
+        # Each slice waits on DOM mutations in the page; a challenge reload simply ends the slice
+        # with a script timeout or JavaScript error and the next slice observes the new document.
+        # Anything else, such as a dead browser session, is raised to the caller.
+        try:
+            return WebDriverWait(driver, max_wait, poll_frequency=0.1,
+                                 ignored_exceptions=(TimeoutException, JavascriptException)).until(
+                lambda d: d.execute_async_script(PAGE_STATE_SCRIPT, slice_seconds * 1000)
+            )
+        except TimeoutException:
+            return None
     
     def try_simple_requests(self, url):
         """Try simple requests as absolute last resort"""
@@ -503,6 +3181,8 @@ class PopmartMonitor:
                 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
             ]
             
+            session = self.session_pool.get(url, ('requests',), requests.Session)
+            
             for ua in user_agents:
                 headers = {
                     'User-Agent': ua,
@@ -511,8 +3191,15 @@ class PopmartMonitor:
                     'Accept-Encoding': 'gzip, deflate',
                     'Connection': 'keep-alive',
                 }
+                headers.update(self.page_cache.conditional_headers(url))
+                
+                self.rate_limiter.acquire(url)
+                with self.session_pool.slot(url):
+                    response = session.get(url, headers=headers, timeout=30, allow_redirects=True)
                 
-                response = requests.get(url, headers=headers, timeout=30, allow_redirects=True)
+                if response.status_code == 304:
+                    self.logger.info("Simple requests: page not modified since last check")
+                    return response
                 
                 if response.status_code == 200 and len(response.text) > 500:
                     self.logger.info(f"Simple requests worked with UA: {ua[:50]}...")
@@ -523,149 +3210,358 @@ class PopmartMonitor:
         except Exception as e:
             self.logger.warning(f"Simple requests failed: {e}")
         
-        self.logger.error("All content fetching methods failed")
         return None
 
-    def extract_product_info(self, html_content, product_url):
-        """Extract product information from HTML"""
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
-        product_info = {
-            'name': '',
-            'price': '',
-            'in_stock': False,
-            'image_url': '',
-            'direct_buy_url': product_url
+    def fetch_streaming(self, url):
+        """Stream the product page and stop reading as soon as it is decisively out of stock
+
+        Returns product info, or None when the streamed page needs the regular fetch path.
+        """
+        self.rate_limiter.acquire(url)
+        # The streamed body keeps its connection busy until the response is closed
+        with self.session_pool.slot(url):
+            return self.read_streamed_page(url)
+
+    def read_streamed_page(self, url):
+        """Issue the streaming GET and scan its body; callers hold the host's connection slot"""
+        headers = {
+            'User-Agent': self.ua.random,
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+            'Accept-Language': 'en-US,en;q=0.5',
+            'Accept-Encoding': 'gzip, deflate',
+            'Connection': 'keep-alive',
         }
+        headers.update(self.page_cache.conditional_headers(url))
         
         try:
-            # Extract product name from title or meta tags
-            title_tag = soup.find('title')
-            if title_tag:
-                product_info['name'] = title_tag.get_text().strip()
-            
-            # Enhanced stock status detection using exact HTML elements
-            
-            # Method 1: Check for specific button classes and text
-            # OUT OF STOCK indicators (most reliable)
-            out_of_stock_indicators = [
-                # Black button with "NOTIFY ME WHEN AVAILABLE"
-                'index_black__RgEgP',
-                'NOTIFY ME WHEN AVAILABLE',
-                'index_renderbtn__iGhhU',
-                # Container class for out of stock
-                'index_actionContainer__EqFYe'
-            ]
-            
-            # IN STOCK indicators  
-            in_stock_indicators = [
-                # Red button with "ADD TO BAG"
-                'index_red__kx6Ql',
-                'ADD TO BAG',
-                'ADD TO CART'
-            ]
+            scraper = self.session_pool.get(
+                url,
+                ('cloudscraper', 'linux'),
+                lambda: cloudscraper.create_scraper(
+                    browser={'browser': 'chrome', 'platform': 'linux', 'desktop': True},
+                    delay=random.uniform(1, 3),
+                    debug=False
+                )
+            )
             
-            page_text = html_content.lower()
+            started = time.perf_counter()
+            # Plain Session.request keeps any clearance cookies but skips cloudscraper's
+            # challenge handling, which would read the whole body up front
+            response = requests.Session.request(scraper, 'GET', url, headers=headers, timeout=30,
+                                                allow_redirects=True, stream=True)
+        except Exception as e:
+            self.logger.warning(f"Streaming fetch failed: {e}")
+            self.metrics.inc('popmart_fetch_attempts_total', strategy='streaming', outcome='error')
+            return None
+        
+        with response:
+            if response.status_code == 304:
+                self.metrics.observe('popmart_fetch_seconds', time.perf_counter() - started, strategy='streaming')
+                product_info = self.page_cache.lookup(url)
+                if product_info is not None:
+                    self.logger.info("Streaming: page not modified since last check")
+                self.metrics.inc('popmart_fetch_attempts_total', strategy='streaming',
+                                 outcome='not_modified' if product_info is not None else 'fallback')
+                return product_info
             
-            # First check for out-of-stock (more specific)
-            is_out_of_stock = False
-            for indicator in out_of_stock_indicators:
-                if indicator.lower() in page_text:
-                    is_out_of_stock = True
-                    break
+            if response.status_code != 200:
+                self.logger.info(f"Streaming fetch returned {response.status_code}, using regular fetch")
+                self.metrics.inc('popmart_fetch_attempts_total', strategy='streaming',
+                                 outcome='blocked' if response.status_code == 403 else 'status')
+                return None
             
-            # Method 2: Use BeautifulSoup for precise element detection
-            if not is_out_of_stock:
-                # Look for the exact out-of-stock button structure
-                notify_button = soup.find('div', class_='index_renderbtn__iGhhU')
-                if notify_button and 'NOTIFY ME WHEN AVAILABLE' in notify_button.get_text():
-                    is_out_of_stock = True
-                
-                # Look for black button class
-                black_button = soup.find('div', class_='index_black__RgEgP')
-                if black_button:
-                    is_out_of_stock = True
-            
-            # Method 3: Look for in-stock indicators if not explicitly out of stock
-            if not is_out_of_stock:
-                for indicator in in_stock_indicators:
-                    if indicator.lower() in page_text:
-                        product_info['in_stock'] = True
-                        break
-                
-                # Look for red button class (in stock)
-                red_button = soup.find('div', class_='index_red__kx6Ql')
-                if red_button:
-                    product_info['in_stock'] = True
-            
-            # If we found out-of-stock indicators, explicitly set to False
-            if is_out_of_stock:
-                product_info['in_stock'] = False
-            
-            # Method 4: Additional validation using action container
-            action_container = soup.find('div', class_='index_actionContainer__EqFYe')
-            if action_container:
-                container_text = action_container.get_text().lower()
-                if 'notify me when available' in container_text:
-                    product_info['in_stock'] = False
-                elif 'add to bag' in container_text:
-                    product_info['in_stock'] = True
-            
-            # Enhanced price extraction
-            price_patterns = [
-                r'\$[\d,]+\.?\d*',
-                r'price["\s]*:[\s]*["\$]*([\d,]+\.?\d*)',
-                r'[\$][\d,]+\.?\d*'
-            ]
+            decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+            scanner = StockStreamScanner()
+            chunks = []
+            bytes_read = 0
             
-            import re
-            for pattern in price_patterns:
-                price_match = re.search(pattern, html_content, re.IGNORECASE)
-                if price_match:
-                    product_info['price'] = price_match.group(0)
+            for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                bytes_read += len(chunk)
+                text = decoder.decode(chunk)
+                chunks.append(text)
+                if scanner.feed(text):
                     break
+            else:
+                chunks.append(decoder.decode(b'', final=True))
             
-            # Look for price in specific elements
-            if not product_info['price']:
-                # Look for price in common price containers
-                price_elements = soup.find_all(['span', 'div'], class_=re.compile(r'price|cost|amount'))
-                for element in price_elements:
-                    text = element.get_text()
-                    price_match = re.search(r'\$[\d,]+\.?\d*', text)
-                    if price_match:
-                        product_info['price'] = price_match.group(0)
-                        break
+            html_content = ''.join(chunks)
+            self.metrics.observe('popmart_fetch_seconds', time.perf_counter() - started, strategy='streaming')
+            if scanner.challenge:
+                self.logger.info("Streaming fetch hit a challenge page, using regular fetch")
+                self.metrics.inc('popmart_fetch_attempts_total', strategy='streaming', outcome='challenge')
+                return None
             
-            # Enhanced image URL extraction
-            img_tags = soup.find_all('img', {'alt': 'POP MART'})
-            for img in img_tags:
-                src = img.get('src', '')
-                if 'popmart.com' in src and any(ext in src for ext in ['jpg', 'png', 'webp', 'jpeg']):
-                    # Prefer larger images
-                    if '800x800' in src or 'large' in src:
-                        product_info['image_url'] = src
-                        break
-                    elif not product_info['image_url']:  # Use any image as fallback
-                        product_info['image_url'] = src
+            if scanner.out_of_stock:
+                self.metrics.inc('popmart_fetch_attempts_total', strategy='streaming', outcome='early_exit')
+                self.logger.info(f"Streaming: decisive out-of-stock marker after {bytes_read} bytes")
+                product_info = self.extract_summary_info(html_content, url)
+            else:
+                # No decisive marker, so only a real product page may be parsed; error pages,
+                # interstitials and empty bodies go through the regular fetch path instead
+                raw_content = html_content.encode('utf-8')
+                page = self.classifier.classify(raw_content)
+                if not self.is_valid_content(page):
+                    self.logger.info(f"Streaming fetch returned a {page.page_type} page, using regular fetch")
+                    self.metrics.inc('popmart_fetch_attempts_total', strategy='streaming', outcome='invalid')
+                    return None
+                self.metrics.inc('popmart_fetch_attempts_total', strategy='streaming', outcome='success')
+                product_info = self.parse_product_page(html_content, url, page, raw_content)
             
-            # Log detection details for debugging
-            stock_status = "IN STOCK" if product_info['in_stock'] else "OUT OF STOCK"
+            self.page_cache.store(url, response, product_info)
+            return product_info
+
+    @span('parse_product_page')
+    def parse_product_page(self, html_content, product_url, page=None, raw_content=None):
+        """Return product info, skipping extraction when the stock region fingerprint is unchanged"""
+        if raw_content is None:
+            raw_content = html_content.encode('utf-8') if isinstance(html_content, str) else html_content
+        if page is None:
+            page = self.classifier.classify(raw_content)
+        
+        fingerprint = self.fingerprints.compute(raw_content, page)
+        product_info = self.fingerprints.lookup(product_url, fingerprint)
+        if product_info is not None:
+            self.logger.info("Stock region unchanged since last check, reusing product info")
+            return product_info
+        
+        embedded_json = self.config.get('monitoring', {}).get('embedded_json', True)
+        with self.metrics.time('popmart_stage_seconds', stage='parse'):
+            if self.parse_pool and len(raw_content) >= self.parse_pool_min_bytes:
+                result = self.parse_pool.parse(raw_content, product_url, page, embedded_json)
+            else:
+                result = parse_page(raw_content, product_url, page, embedded_json)
+        product_info = self.log_parse_result(result, page)
+        
+        self.fingerprints.store(product_url, fingerprint, product_info)
+        return product_info
+
+    def log_parse_result(self, result, page):
+        """Log the outcome of parse_page and return its product info"""
+        for error in result['errors']:
+            self.logger.warning(error)
+        
+        product_info = result['product_info']
+        stock_status = "IN STOCK" if product_info.in_stock else "OUT OF STOCK"
+        if result['source'] == 'html':
             self.logger.info(f"Stock detection: {stock_status}")
-            if is_out_of_stock:
+            if page.has('out_of_stock'):
                 self.logger.info("  - Found out-of-stock indicators (black button/notify text)")
-            
-        except Exception as e:
-            self.logger.error(f"Error extracting product info: {e}")
-        
+        else:
+            self.logger.info(f"Stock detection ({result['source']}): {stock_status}")
         return product_info
 
+    def extract_summary_info(self, html_content, product_url):
+        """Build out-of-stock product info from a partial page without a full parse"""
+        title_match = TITLE_PATTERN.search(html_content)
+        name = html.unescape(title_match.group(1)).strip() if title_match else ''
+        
+        price = ''
+        for pattern in PRICE_PATTERNS:
+            price_match = pattern.search(html_content)
+            if price_match:
+                price = price_match.group(0)
+                break
+        
+        return ProductInfo(name, price, False, '', product_url)
+
+    @span('extract_product_info')
+    def extract_product_info(self, html_content, product_url, page=None):
+        """Extract product information from HTML in a single pass over the lxml tree"""
+        html_bytes = html_content if isinstance(html_content, bytes) else html_content.encode('utf-8')
+        if page is None:
+            page = self.classifier.classify(html_bytes)
+        
+        errors = []
+        product_info = extract_html_product(html_bytes, product_url, page, errors)
+        return self.log_parse_result({'product_info': product_info, 'source': 'html', 'errors': errors}, page)
+
     def check_product(self, product_config):
-        """Check individual product availability"""
-        product_url = product_config['url']
-        product_name = product_config['name']
+        """Check a product and record how long the check took and what it found"""
+        started = time.perf_counter()
+        result = 'failed'
+        try:
+            result = self.run_product_check(product_config)
+            return result == 'in_stock'
+        finally:
+            elapsed = time.perf_counter() - started
+            self.metrics.observe('popmart_stage_seconds', elapsed, stage='check')
+            if self.metrics_per_product:
+                self.metrics.observe('popmart_product_check_seconds', elapsed, product=product_config.name)
+                self.metrics.inc('popmart_product_checks_total', product=product_config.name, result=result)
+            else:
+                self.metrics.inc('popmart_product_checks_total', result=result)
+
+    def run_product_check(self, product_config):
+        """Check individual product availability; returns 'in_stock', 'out_of_stock' or 'failed'"""
+        product_url = product_config.url
+        product_name = product_config.name
         
         self.logger.info(f"Checking product: {product_name}")
         
+        product_info = None
+        if self.config.get('monitoring', {}).get('streaming_detection', True):
+            # Streaming goes out on the Linux CloudScraper session, so it sits out that strategy's cooldown
+            if self.fetch_strategies.cooldown_remaining('cloudscraper_linux'):
+                self.metrics.inc('popmart_fetch_attempts_total', strategy='streaming', outcome='skipped')
+            else:
+                product_info = self.fetch_streaming(product_url)
+        
+        if product_info is None:
+            product_info = self.fetch_product_info(product_config)
+        
+        return self.record_check_result(product_config, product_info)
+
+    def record_check_result(self, product_config, product_info):
+        """Store the outcome of a check and alert on restocks; returns 'in_stock', 'out_of_stock' or 'failed'"""
+        product_url = product_config.url
+        product_name = product_config.name
+        
+        now = time.time()
+        self.last_check_time[product_url] = now
+        if self.request_budget:
+            self.request_budget.record(product_url, product_info is not None)
+        
+        if product_info is None:
+            self.state_store.record_failure(product_url)
+            return 'failed'
+        
+        previous = self.state_store.get(product_url)
+        was_in_stock = bool(previous and previous.in_stock)
+        fingerprint_entry = self.fingerprints.entries.get(product_url)
+        fingerprint = fingerprint_entry[0] if fingerprint_entry else None
+        
+        # Notifications are edge-triggered: only the out-of-stock -> in-stock transition alerts
+        if product_info.in_stock:
+            # Recorded before the alert is queued, so an alert that fails later can re-arm the product
+            self.state_store.record(product_url, product_info, fingerprint, now)
+            if was_in_stock:
+                self.logger.info(f"Product still in stock (already notified): {product_name}")
+            elif not self.send_stock_notification(product_info, product_config):
+                # The next check retries the alert
+                self.state_store.rearm(product_url)
+            return 'in_stock'
+        else:
+            if was_in_stock:
+                self.logger.info(f"Product went out of stock: {product_name}")
+            else:
+                self.logger.info(f"Product still out of stock: {product_name}")
+            self.state_store.record(product_url, product_info, fingerprint, now)
+            return 'out_of_stock'
+
+    def record_listing_check(self, product_config, product_info):
+        """Record a product settled from a listing page as a completed check"""
+        result = self.record_check_result(product_config, product_info)
+        if self.metrics_per_product:
+            self.metrics.inc('popmart_product_checks_total', product=product_config.name, result=result)
+        else:
+            self.metrics.inc('popmart_product_checks_total', result=result)
+        return result
+
+    def fetch_listing(self, url, product_ids):
+        """Fetch and parse a listing page; returns fields per tracked product ID on it, or None"""
+        with self.metrics.time('popmart_stage_seconds', stage='listing'):
+            content = self.handle_cloudflare_challenge(url)
+        
+        if isinstance(content, requests.Response):
+            raw_content = content.content
+            page = getattr(content, 'page_class', None) or self.classifier.classify(raw_content)
+        elif content:
+            raw_content = content.encode('utf-8')
+            page = self.classifier.classify(raw_content)
+        else:
+            raw_content = None
+        
+        if raw_content is None or page.has('challenge'):
+            self.logger.warning(f"Could not fetch listing page: {url}")
+            self.metrics.inc('popmart_listing_fetches_total', result='failed')
+            return None
+        
+        embedded_json = self.config.get('monitoring', {}).get('embedded_json', True)
+        with self.metrics.time('popmart_stage_seconds', stage='parse'):
+            result = parse_listing(raw_content, product_ids, embedded_json)
+        for error in result['errors']:
+            self.logger.warning(error)
+        self.metrics.inc('popmart_listing_fetches_total', result='success')
+        return result['items']
+
+    def check_listings(self, products):
+        """Settle products from listing pages; returns the products that still need a product page check"""
+        listings_config = self.config.get('listings', {})
+        listing_urls = listings_config.get('urls') or []
+        if not listing_urls:
+            return products
+        
+        tracked = {}
+        for product in self.config.get('products', []):
+            item_id = product_id(product.url)
+            if item_id is not None:
+                tracked[item_id] = product
+        due_ids = {product_id(product.url) for product in products}
+        
+        # Listings known to show a due product, plus those never fetched so we learn what they show
+        wanted = [url for url in listing_urls
+                  if url not in self.listing_products or self.listing_products[url] & due_ids]
+        if not wanted:
+            return products
+        
+        product_ids = frozenset(tracked)
+        found = {}
+        fetched = 0
+        for url, items in zip(wanted, self.executor.map(lambda url: self.fetch_listing(url, product_ids), wanted)):
+            if items is None:
+                continue
+            fetched += 1
+            self.listing_products[url] = frozenset(items)
+            for item_id, fields in items.items():
+                merge_listing_item(found, item_id, fields)
+        
+        now = time.time()
+        due_urls = {product.url for product in products}
+        confirm_restocks = listings_config.get('confirm_restocks', True)
+        settled = set()
+        outcomes = Counter()
+        for item_id, fields in found.items():
+            product = tracked[item_id]
+            if fields['in_stock'] is None:
+                outcomes['ambiguous'] += 1
+                continue
+            
+            previous = self.state_store.get(product.url)
+            if fields['in_stock'] and confirm_restocks and not (previous and previous.in_stock):
+                # A restock seen on a listing alerts only once the product page confirms it
+                outcomes['confirm'] += 1
+                if product.url not in due_urls:
+                    self.scheduler.reschedule(product.url, now)
+                continue
+            
+            product_info = ProductInfo(
+                fields['name'] or product.name,
+                fields['price'] or (previous.price if previous else None) or '',
+                fields['in_stock'],
+                fields['image_url'] or (previous.image_url if previous else None) or '',
+                product.url
+            )
+            self.record_listing_check(product, product_info)
+            settled.add(product.url)
+            outcomes['settled'] += 1
+            if product.url not in due_urls:
+                # Checked for free along with a due product, so its own check can wait a full interval
+                interval = self.product_interval(product)
+                self.scheduler.reschedule(product.url, now + interval + self.product_jitter(product, interval))
+        
+        for outcome, count in outcomes.items():
+            self.metrics.inc('popmart_listing_products_total', count, outcome=outcome)
+        remaining = [product for product in products if product.url not in settled]
+        self.logger.info(f"📋 Listings: {fetched}/{len(wanted)} pages fetched, {outcomes['settled']} products settled "
+                         f"({len(settled & due_urls)} due), {outcomes['confirm']} restocks to confirm, "
+                         f"{len(remaining)} products need a page check")
+        return remaining
+
+    def fetch_product_info(self, product_config):
+        """Fetch and parse the product page with retries across all fetch methods"""
+        product_url = product_config.url
+        product_name = product_config.name
+        
         max_retries = self.config.get('cloudflare', {}).get('max_retries', 3)
         retry_delay = self.config.get('cloudflare', {}).get('retry_delay', 10)
         
@@ -676,29 +3572,39 @@ class PopmartMonitor:
                     time.sleep(retry_delay + random.uniform(1, 5))
                 
                 # Get page content without login
-                content = self.handle_cloudflare_challenge(product_url)
+                with self.metrics.time('popmart_stage_seconds', stage='fetch'):
+                    content = self.handle_cloudflare_challenge(product_url)
                 
                 if content:
+                    if isinstance(content, requests.Response) and content.status_code == 304:
+                        # Page unchanged since the last check, so reuse the previous result
+                        product_info = self.page_cache.lookup(product_url)
+                        if product_info is None:
+                            self.logger.warning(f"Got 304 without a cached page for {product_name}, refetching")
+                            continue
+                        return product_info
+                    
                     if isinstance(content, requests.Response):
                         html_content = content.text
+                        raw_content = content.content
+                        page = getattr(content, 'page_class', None) or self.classifier.classify(raw_content)
                     else:
                         html_content = content
+                        raw_content = content.encode('utf-8')
+                        page = self.classifier.classify(raw_content)
                     
                     # Check if login is required for this specific product
-                    if self.is_login_required(html_content):
+                    if self.is_login_required(html_content, page):
                         self.logger.warning(f"Login required for {product_name}, but monitoring without login")
                         # Continue monitoring - some info might still be available
                     
                     # Extract product information
-                    product_info = self.extract_product_info(html_content, product_url)
+                    product_info = self.parse_product_page(html_content, product_url, page, raw_content)
                     
-                    # Check if product is now in stock
-                    if product_info['in_stock']:
-                        self.send_stock_notification(product_info, product_config)
-                        return True
-                    else:
-                        self.logger.info(f"Product still out of stock: {product_name}")
-                        return False
+                    if isinstance(content, requests.Response):
+                        self.page_cache.store(product_url, content, product_info)
+                    
+                    return product_info
                         
                 else:
                     self.logger.warning(f"Failed to get content for {product_name} (attempt {attempt + 1})")
@@ -714,7 +3620,7 @@ class PopmartMonitor:
                 )
         
         self.logger.error(f"Failed to check product after {max_retries} attempts: {product_name}")
-        return False
+        return None
 
     def handle_location_popup(self):
         """Handle United States location confirmation popup"""
@@ -833,42 +3739,12 @@ class PopmartMonitor:
             self.logger.error(f"Login process failed: {e}")
             return False
 
-    def is_login_required(self, html_content):
+    @span('is_login_required')
+    def is_login_required(self, html_content, page=None):
         """Check if the page requires login using specific HTML elements"""
-        login_indicators = [
-            # Email input page
-            'placeholder="Enter your e-mail address"',
-            'class="ant-input index_loginInput__HBgjq"',
-            'id="email"',
-            
-            # Password input page  
-            'placeholder="Enter your password"',
-            'id="password"',
-            'class="index_disabledEmail__sdPjU"',
-            
-            # Login form
-            'class="ant-form ant-form-horizontal index_loginForm__yLEpj"',
-            
-            # Login buttons
-            'class="ant-btn ant-btn-primary index_loginButton__O6r8l"',
-            
-            # Service agreement checkbox
-            'class="index_serviceCheck__D3US1"',
-            'class="ant-checkbox-wrapper index_serviceCheckbox__KjCpl"',
-            
-            # Privacy policy popup
-            'class="policy_aboveFixedContainer__KfeZi"',
-            'class="policy_acceptBtn__ZNU71"',
-            
-            # Location popup
-            'class="index_ipWarnContainer__d5qTd"',
-            'You are in the United States'
-        ]
-        
-        for indicator in login_indicators:
-            if indicator in html_content:
-                return True
-        return False
+        if page is None:
+            page = self.classifier.classify(html_content)
+        return page.has('login')
 
     def handle_login_if_required(self, html_content):
         """Handle login process if required and account details are provided"""
@@ -897,66 +3773,292 @@ class PopmartMonitor:
 
     def send_stock_notification(self, product_info, product_config):
         """Send stock availability notification"""
-        fields = [
-            {
-                'name': '💰 Price',
-                'value': product_info.get('price', 'N/A'),
-                'inline': True
-            },
-            {
-                'name': '🔗 Direct Buy Link',
-                'value': f"[BUY NOW]({product_info['direct_buy_url']})",
-                'inline': True
-            },
-            {
-                'name': '⏰ Time',
-                'value': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'inline': True
-            }
+        with self.metrics.time('popmart_stage_seconds', stage='notify'):
+            sent = self.send_embed(stock_notification_embed(product_info),
+                                   lambda: self.rearm_alert(product_config))
+        self.metrics.inc('popmart_notifications_total', outcome='queued' if sent else 'failed')
+        return sent
+
+    def rearm_alert(self, product_config):
+        """Let the next in-stock check alert again after a restock alert could not be delivered"""
+        self.metrics.inc('popmart_notifications_total', outcome='undelivered')
+        if self.state_store.rearm(product_config.url):
+            self.logger.warning(f"Restock alert for {product_config.name} was not delivered, "
+                                f"alerting again on the next in-stock check")
+
+    def collect_metrics(self):
+        """Scrape-time samples read from the pools, caches, dispatcher and scheduler"""
+        dispatch = self.dispatcher.stats()
+        samples = [
+            ('popmart_sessions_total', {'result': 'created'}, self.session_pool.created),
+            ('popmart_sessions_total', {'result': 'reused'}, self.session_pool.reused),
+            ('popmart_page_cache_total', {'result': 'hit'}, self.page_cache.hits),
+            ('popmart_page_cache_total', {'result': 'miss'}, self.page_cache.misses),
+            ('popmart_fingerprint_total', {'result': 'hit'}, self.fingerprints.hits),
+            ('popmart_fingerprint_total', {'result': 'miss'}, self.fingerprints.misses),
+            ('popmart_rate_limited_requests_total', {}, self.rate_limiter.acquired),
+            ('popmart_dispatcher_queue_depth', {}, dispatch['queue_depth']),
+            ('popmart_dispatcher_sent_total', {}, dispatch['sent']),
+            ('popmart_dispatcher_failed_total', {}, dispatch['failed']),
+            ('popmart_dispatcher_latency_seconds', {'quantile': 'avg'}, dispatch['latency_avg']),
+            ('popmart_dispatcher_latency_seconds', {'quantile': '0.95'}, dispatch['latency_p95']),
+            ('popmart_scheduler_lateness_seconds', {}, self.scheduler_stats['last_lateness']),
+            ('popmart_scheduler_overruns_total', {}, self.scheduler_stats['overruns']),
         ]
+        for name, stats in self.fetch_strategies.stats().items():
+            samples.extend([
+                ('popmart_strategy_rank', {'strategy': name}, stats['rank']),
+                ('popmart_strategy_success_ratio', {'strategy': name}, stats['success_rate']),
+                ('popmart_strategy_latency_seconds', {'strategy': name}, stats['latency']),
+                ('popmart_strategy_cooldown_seconds', {'strategy': name}, stats['cooldown']),
+            ])
+        return samples
+
+    def start_metrics_server(self):
+        """Serve Prometheus metrics on localhost in a background thread"""
+        try:
+            self.metrics_server = self.create_metrics_server()
+        except OSError as e:
+            metrics_config = self.config.get('metrics', {})
+            self.logger.warning(f"Could not start metrics server on {metrics_config.get('host', '127.0.0.1')}:"
+                                f"{metrics_config.get('port', 9108)}: {e}")
+
+    def create_metrics_server(self):
+        """Bind and start the metrics server for the metrics settings, or None when it is disabled"""
+        metrics_config = self.config.get('metrics', {})
+        if not metrics_config.get('enabled', True):
+            return None
         
-        self.send_discord_notification(
-            title="🎉 PRODUCT IN STOCK!",
-            description=f"**{product_info['name']}** is now available!",
-            color=0x00ff00,
-            fields=fields,
-            image_url=product_info.get('image_url')
-        )
+        host = metrics_config.get('host', '127.0.0.1')
+        port = metrics_config.get('port', 9108)
+        handler = type('BoundMetricsHandler', (MetricsHandler,),
+                       {'registry': self.metrics, 'profiler': self.profiler})
+        server = ThreadingHTTPServer((host, port), handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+        self.logger.info(f"📈 Metrics available at http://{host}:{port}/metrics "
+                         f"(POST /profile?cycles=N to capture a profile)")
+        return server
 
-    def monitor_products(self):
-        """Monitor all configured products"""
-        products = self.config.get('products', [])
+    def install_profile_signal(self):
+        """Capture a profile of the next cycles when the process receives SIGUSR1"""
+        profiling_config = self.config.get('profiling', {})
+        if not profiling_config.get('signal', True) or not hasattr(signal, 'SIGUSR1'):
+            return
+        
+        cycles = profiling_config.get('cycles', 3)
+        
+        def handle_signal(signum, frame):
+            self.profiler.request_from_signal(cycles)
+        
+        try:
+            signal.signal(signal.SIGUSR1, handle_signal)
+            self.logger.info(f"🔬 Send SIGUSR1 (kill -USR1 {os.getpid()}) to profile the next {cycles} cycles")
+        except ValueError:
+            # signal handlers can only be installed from the main thread
+            pass
+
+    def log_metrics_summary(self):
+        """Log stage and fetch strategy timings when the summary interval has passed"""
+        if not self.metrics_summary_interval or time.time() < self.metrics_summary_due:
+            return
+        self.metrics_summary_due = time.time() + self.metrics_summary_interval
+        
+        self.logger.info(f"📈 Stage timings: {self.metrics.summary('popmart_stage_seconds', 'stage') or 'none'}")
+        self.logger.info(f"📈 Fetch timings: {self.metrics.summary('popmart_fetch_seconds', 'strategy') or 'none'}")
+        self.logger.info(f"📈 Span timings: {self.metrics.summary('popmart_span_seconds', 'span') or 'none'}")
+        self.logger.info(f"📈 Fetch outcomes: "
+                         f"{self.metrics.counter_summary('popmart_fetch_attempts_total', 'strategy', 'outcome') or 'none'}")
+        ranking = sorted(self.fetch_strategies.stats().items(), key=lambda item: item[1]['rank'])
+        self.logger.info("📈 Fetch strategy order: " + ', '.join(
+            f"{name} ({stats['success_rate']:.0%}, {stats['latency']:.1f}s"
+            + (f", cooldown {stats['cooldown']:.0f}s)" if stats['cooldown'] else ")")
+            for name, stats in ranking))
+
+    def monitor_products(self, products=None):
+        """Monitor the given products, or all configured products"""
+        if products is None:
+            products = self.config.get('products', [])
         
         if not products:
             self.logger.warning("No products configured for monitoring!")
             return
         
-        self.logger.info(f"Starting monitoring cycle for {len(products)} products...")
+        products = self.check_listings(products)
+        if not products:
+            return
         
-        for product in products:
-            try:
-                self.check_product(product)
-                
-                # Random delay between product checks
-                if self.config.get('monitoring', {}).get('random_delay', True):
-                    delay = random.uniform(10, 30)
-                    time.sleep(delay)
-                    
-            except Exception as e:
-                self.logger.error(f"Error in monitoring cycle: {e}")
-                self.send_discord_notification(
-                    title="🚨 Monitor Error",
-                    description=f"Critical error in monitoring cycle: {str(e)}",
-                    color=0xff0000
-                )
+        self.logger.info(f"Starting monitoring cycle for {len(products)} products "
+                         f"(concurrency {self.max_concurrent_checks})...")
+        
+        cycle_start = time.time()
+        asyncio.run(self.run_checks(products))
+        self.logger.info(f"Monitoring cycle finished in {time.time() - cycle_start:.1f}s "
+                         f"(sessions created: {self.session_pool.created}, reused: {self.session_pool.reused}, "
+                         f"page cache hit ratio: {self.page_cache.hit_ratio():.0%}, "
+                         f"fingerprint hits: {self.fingerprints.hits}, misses: {self.fingerprints.misses})")
+        if self.parse_pool:
+            self.logger.info(f"Parse workers: {self.parse_pool.parsed} pages parsed out of process, "
+                             f"{self.parse_pool.fallbacks} in-process fallbacks")
+        
+        dispatch = self.dispatcher.stats()
+        self.logger.info(f"Discord dispatcher: queue depth {dispatch['queue_depth']}, sent {dispatch['sent']} "
+                         f"in {dispatch['batches']} batches, failed {dispatch['failed']}, "
+                         f"latency avg {dispatch['latency_avg'] * 1000:.0f}ms p95 {dispatch['latency_p95'] * 1000:.0f}ms")
+
+    async def run_checks(self, products):
+        """Run product checks concurrently within the concurrency limit"""
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self.max_concurrent_checks)
+        random_delay = self.config.get('monitoring', {}).get('random_delay', True)
+
+        async def run_one(product):
+            # Small random stagger so checks don't hit the host in lockstep; taken before the
+            # semaphore so a sleeping check never holds a slot another check could use
+            if random_delay:
+                await asyncio.sleep(random.uniform(0, 3))
+            
+            async with semaphore:
+                try:
+                    return await loop.run_in_executor(self.executor, self.check_product, product)
+                except Exception as e:
+                    self.logger.error(f"Error in monitoring cycle: {e}")
+                    self.send_discord_notification(
+                        title="🚨 Monitor Error",
+                        description=f"Critical error in monitoring cycle: {str(e)}",
+                        color=0xff0000
+                    )
+                    return False
+
+        return await asyncio.gather(*(run_one(product) for product in products))
+
+    def product_interval(self, product):
+        """Check interval in seconds for a product, bounded by max_check_interval_minutes"""
+        if self.request_budget:
+            interval = self.request_budget.interval(product.url)
+            if interval is not None:
+                return interval
+        
+        monitoring_config = self.config.get('monitoring', {})
+        minutes = product.interval_minutes
+        if minutes is None:
+            minutes = monitoring_config.get('check_interval_minutes', 2)
+        max_minutes = monitoring_config.get('max_check_interval_minutes')
+        if max_minutes:
+            minutes = min(minutes, max_minutes)
+        return max(float(minutes), 0.1) * 60
+
+    def product_jitter(self, product, interval):
+        """Random extra delay for a product's next check"""
+        if product.jitter_seconds is not None:
+            return random.uniform(0, product.jitter_seconds)
+        if self.config.get('monitoring', {}).get('random_delay', True):
+            return random.uniform(0, interval * 0.1)
+        return 0.0
+
+    def allocate_budget(self):
+        """Recompute each product's share of the request budget from its current weight"""
+        if not self.request_budget:
+            return
+        
+        products = self.config.get('products', [])
+        states = {product.url: self.state_store.get(product.url) for product in products}
+        intervals = self.request_budget.allocate(products, states)
+        if self.request_budget.over_budget:
+            self.logger.warning(f"Request budget of {self.request_budget.rate * 60:.1f}/min cannot cover "
+                                f"pinned intervals and max_check_interval_minutes for {len(products)} products; "
+                                f"intervals were stretched to stay within the budget")
+        
+        if intervals:
+            self.logger.info(f"Request budget: {len(intervals)} products, intervals "
+                             f"{min(intervals.values()):.0f}s-{max(intervals.values()):.0f}s, "
+                             f"{self.request_budget.requests_per_check:.2f} requests per check")
+
+    def schedule_products(self):
+        """Queue every configured product, resuming from the last check time after a restart"""
+        self.allocate_budget()
+        now = time.time()
+        for product in self.config.get('products', []):
+            self.schedule_product(product, now)
+
+    def schedule_product(self, product, now):
+        """Queue one product for its next check after the last one, or now if it was never checked"""
+        last_check = self.last_check_time.get(product.url)
+        due = max(now, last_check + self.product_interval(product)) if last_check else now
+        self.scheduler.schedule(product.url, due)
+
+    def run_due_checks(self):
+        """Run every product that is due as one batch and reschedule it"""
+        now = time.time()
+        due = self.scheduler.pop_due(now)
+        if not due:
+            return 0
+        
+        products_by_url = {product.url: product for product in self.config.get('products', [])}
+        batch = [(products_by_url[url], due_time) for url, due_time in due if url in products_by_url]
+        if not batch:
+            return 0
+        
+        lateness = max(now - due_time for _, due_time in batch)
+        self.scheduler_stats['batches'] += 1
+        self.scheduler_stats['last_lateness'] = lateness
+        self.scheduler_stats['max_lateness'] = max(self.scheduler_stats['max_lateness'], lateness)
+        
+        # The batch runs to completion before the scheduler looks again, so cycles never overlap
+        requests_before = self.rate_limiter.acquired
+        self.profiler.cycle_started()
+        try:
+            self.monitor_products([product for product, _ in batch])
+        finally:
+            self.profiler.cycle_finished()
+        
+        if self.request_budget:
+            self.request_budget.observe_cost(self.rate_limiter.acquired - requests_before, len(batch))
+            self.allocate_budget()
+        
+        finished = time.time()
+        overruns = 0
+        for product, due_time in batch:
+            interval = self.product_interval(product)
+            next_due = due_time + interval
+            if next_due < finished:
+                # The check ran past its next slot: start the next one now instead of piling up
+                overruns += 1
+                next_due = finished
+            self.scheduler.schedule(product.url, next_due + self.product_jitter(product, interval))
+        
+        self.scheduler_stats['overruns'] += overruns
+        if overruns:
+            self.logger.warning(f"Scheduler overrun: {overruns}/{len(batch)} products finished after their "
+                                f"next due time (batch took {finished - now:.1f}s, "
+                                f"{self.scheduler_stats['overruns']} overruns total)")
+        self.logger.info(f"Scheduler: {len(batch)} products checked, started {lateness:.1f}s after due "
+                         f"(max {self.scheduler_stats['max_lateness']:.1f}s)")
+        return len(batch)
+
+    def stop(self):
+        """Ask the monitoring loop to exit after the current batch"""
+        self.stop_event.set()
+        self.scheduler.wake.set()
 
     def cleanup(self):
         """Cleanup resources"""
+        # Checks in flight and undelivered alerts still write product state, so the store closes last
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        self.dispatcher.stop()
+        self.session_pool.close()
+        self.profiler.finish()
+        self.browser_pool.close()
+        if self.metrics_server:
+            self.metrics_server.shutdown()
+        if self.parse_pool:
+            self.parse_pool.close()
         if self.driver:
             try:
                 self.driver.quit()
             except Exception:
                 pass
+        self.state_store.close()
 
     def run_monitor(self):
         """Main monitoring loop"""
@@ -969,14 +4071,33 @@ class PopmartMonitor:
             color=0x0099ff
         )
         
+        self.start_metrics_server()
+        self.install_profile_signal()
+        self.install_reload_signal()
+        
+        if (self.config.get('cloudflare', {}).get('use_selenium_fallback', True)
+                and self.config.get('selenium', {}).get('prewarm', True)):
+            self.browser_pool.warm_in_background()
+        
         try:
-            # Schedule monitoring
-            interval = self.config.get('monitoring', {}).get('check_interval_minutes', 2)
-            schedule.every(interval).minutes.do(self.monitor_products)
+            # Schedule monitoring per product and sleep exactly until the next one is due
+            self.schedule_products()
+            if not self.config.get('products'):
+                self.logger.warning("No products configured for monitoring!")
             
-            while True:
-                schedule.run_pending()
-                time.sleep(30)  # Check schedule every 30 seconds
+            while not self.stop_event.is_set():
+                self.run_due_checks()
+                self.reload_config_if_changed()
+                self.log_metrics_summary()
+                
+                next_due = self.scheduler.next_due()
+                timeout = None if next_due is None else max(next_due - time.time(), 0)
+                reload_interval = self.config.get('monitoring', {}).get('config_reload_seconds', 5)
+                if reload_interval:
+                    # Wake up for the next config poll even when no product is due before it
+                    until_reload = max(self.config_reload_due - time.time(), 0)
+                    timeout = until_reload if timeout is None else min(timeout, until_reload)
+                self.scheduler.wait(timeout)
                 
         except KeyboardInterrupt:
             self.logger.info("Monitor stopped by user")
@@ -55,8 +55,8 @@ def check_python_packages():
     print("\n🔍 Checking Python packages...")
     
     required_packages = [
-        'requests', 'cloudscraper', 'beautifulsoup4', 'selenium', 
-        'undetected-chromedriver', 'discord-webhook', 'schedule', 
+        'requests', 'cloudscraper', 'selenium', 
+        'undetected-chromedriver', 'discord-webhook', 
         'fake-useragent', 'lxml', 'webdriver-manager'
     ]
     
@@ -0,0 +1,574 @@
+#!/usr/bin/env python3
+"""
+Sharded Monitoring for Popmart Monitor
+A coordinator splits the configured products across worker processes on this or other hosts
+with consistent hashing, shares one per-host rate limit between them and deduplicates their
+stock alerts; workers are ordinary monitors that check only their shard
+"""
+
+import argparse
+import bisect
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import re
+import secrets
+import socket
+import threading
+import time
+from multiprocessing.managers import BaseManager
+
+from bot import (DiscordDispatcher, HostRateLimiter, PopmartMonitor, ProductStateStore, load_products,
+                 stock_notification_embed, validate_config)
+
+# Errors a coordinator proxy raises when the coordinator is down or the connection dropped
+CONNECTION_ERRORS = (OSError, EOFError)
+
+
+class HashRing:
+    """Consistent hash ring with virtual nodes, so a worker joining or leaving only moves its own share"""
+
+    def __init__(self, replicas=100):
+        self.replicas = replicas
+        self.points = []
+        self.owners = {}
+        self.nodes = set()
+
+    @staticmethod
+    def hash(value):
+        """Stable 64-bit position on the ring"""
+        return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+
+    def add(self, node):
+        """Place a node's virtual points on the ring"""
+        if node in self.nodes:
+            return
+        self.nodes.add(node)
+        for replica in range(self.replicas):
+            point = self.hash(f"{node}#{replica}")
+            self.owners[point] = node
+            bisect.insort(self.points, point)
+
+    def remove(self, node):
+        """Take a node's virtual points off the ring"""
+        if node not in self.nodes:
+            return
+        self.nodes.discard(node)
+        self.points = [point for point in self.points if self.owners[point] != node]
+        self.owners = {point: self.owners[point] for point in self.points}
+
+    def get(self, key):
+        """Node owning the key, or None when the ring is empty"""
+        if not self.points:
+            return None
+        index = bisect.bisect(self.points, self.hash(key)) % len(self.points)
+        return self.owners[self.points[index]]
+
+
+class ShardCoordinator:
+    """Worker membership, shard assignment, the shared rate limit and merged product state"""
+
+    def __init__(self, products, state_store, rate_limiter, dispatcher, logger,
+                 heartbeat_timeout=20, replicas=100):
+        self.products = list(products)
+        self.state_store = state_store
+        self.rate_limiter = rate_limiter
+        self.dispatcher = dispatcher
+        self.logger = logger
+        self.heartbeat_timeout = heartbeat_timeout
+        self.ring = HashRing(replicas)
+        self.heartbeats = {}
+        self.version = 0
+        self.lock = threading.Lock()
+        # Guards alert dedup, re-arming and the stats counters, which manager threads update concurrently
+        self.notify_lock = threading.Lock()
+        self.stats = {'restocks': 0, 'duplicates': 0, 'reports': 0, 'stale_reports': 0, 'undelivered': 0}
+        # Products whose restock alert was lost; their owner re-arms them on its next report
+        self.rearmed = set()
+
+    def heartbeat(self, worker_id):
+        """Mark a worker alive, adding it to the ring if needed; returns the assignment version"""
+        with self.lock:
+            self.heartbeats[worker_id] = time.monotonic()
+            if worker_id not in self.ring.nodes:
+                self.ring.add(worker_id)
+                self.version += 1
+                self.logger.info(f"🧩 Worker {worker_id} joined, rebalancing {len(self.products)} products "
+                                 f"over {len(self.ring.nodes)} workers (v{self.version})")
+            return self.version
+
+    def unregister(self, worker_id, reason='left'):
+        """Drop a worker so its products move to the remaining ones"""
+        with self.lock:
+            self.heartbeats.pop(worker_id, None)
+            if worker_id not in self.ring.nodes:
+                return
+            self.ring.remove(worker_id)
+            self.version += 1
+            self.logger.warning(f"🧩 Worker {worker_id} {reason}, rebalancing {len(self.products)} products "
+                                f"over {len(self.ring.nodes)} workers (v{self.version})")
+
+    def reap(self, now=None):
+        """Drop workers whose last heartbeat is older than the timeout"""
+        now = now or time.monotonic()
+        with self.lock:
+            expired = [worker_id for worker_id, seen in self.heartbeats.items()
+                       if now - seen > self.heartbeat_timeout]
+        for worker_id in expired:
+            self.unregister(worker_id, f"missed heartbeats for {self.heartbeat_timeout}s")
+        return expired
+
+    def assignment(self, worker_id):
+        """(version, products, last known states) for the worker's shard"""
+        with self.lock:
+            products = [product for product in self.products if self.ring.get(product.url) == worker_id]
+            version = self.version
+        states = {}
+        for product in products:
+            state = self.state_store.get(product.url)
+            if state:
+                states[product.url] = state
+        return version, products, states
+
+    def update_products(self, products):
+        """Replace the product list after a config reload; workers pick up the new shards on their next heartbeat"""
+        products = list(products)
+        with self.lock:
+            if [product.to_config() for product in products] == [product.to_config() for product in self.products]:
+                return False
+            before = {product.url for product in self.products}
+            after = {product.url for product in products}
+            self.products = products
+            self.version += 1
+            self.logger.info(f"🧩 Product list reloaded (+{len(after - before)} -{len(before - after)}), "
+                             f"rebalancing {len(products)} products over {len(self.ring.nodes)} workers "
+                             f"(v{self.version})")
+            return True
+
+    def reserve(self, url):
+        """Reserve a slot in the shared per-host rate limit; returns the seconds to wait"""
+        return self.rate_limiter.reserve(url)
+
+    def report(self, worker_id, state):
+        """Merge a worker's latest state for a product; returns 'rearm' when its restock alert was lost"""
+        with self.lock:
+            owner = self.ring.get(state.url)
+        with self.notify_lock:
+            if owner != worker_id:
+                self.stats['stale_reports'] += 1
+                return False
+            self.stats['reports'] += 1
+            if state.url in self.rearmed:
+                self.rearmed.discard(state.url)
+                if state.in_stock:
+                    # Keep the merged state out of stock so the owner's next alert goes through
+                    return 'rearm'
+            self.state_store.adopt(state)
+        return True
+
+    def notify_restock(self, worker_id, url, product_info):
+        """Send a restock alert unless another worker already announced this restock"""
+        with self.notify_lock:
+            previous = self.state_store.get(url)
+            if previous and previous.in_stock:
+                # Two owners saw the same restock around a rebalance
+                self.stats['duplicates'] += 1
+                self.logger.info(f"Duplicate restock alert from {worker_id} suppressed: {product_info.name}")
+                return True
+            self.state_store.record(url, product_info)
+            if not self.dispatcher.submit(stock_notification_embed(product_info),
+                                          lambda: self.rearm(url, product_info.name)):
+                self.state_store.rearm(url)
+                return False
+            self.stats['restocks'] += 1
+        self.logger.info(f"🎉 Restock reported by {worker_id}: {product_info.name}")
+        return True
+
+    def rearm(self, url, name):
+        """Re-arm a product whose restock alert could not be delivered"""
+        with self.notify_lock:
+            self.stats['undelivered'] += 1
+            if self.state_store.rearm(url):
+                self.rearmed.add(url)
+                self.logger.warning(f"Restock alert for {name} was not delivered, alerting again on its next check")
+
+    def notify(self, worker_id, embed):
+        """Send any other notification from a worker through the shared dispatcher"""
+        return self.dispatcher.submit(embed)
+
+    def status(self):
+        """Membership, shard sizes and counters"""
+        with self.lock:
+            shards = dict.fromkeys(self.ring.nodes, 0)
+            for product in self.products:
+                owner = self.ring.get(product.url)
+                if owner is not None:
+                    shards[owner] += 1
+            version = self.version
+        with self.notify_lock:
+            stats = dict(self.stats)
+        return {'version': version, 'shards': shards, **stats}
+
+
+class CoordinatorManager(BaseManager):
+    """Serves the coordinator to workers over an authenticated local or TCP connection"""
+
+
+# Workers only need the name; the coordinator process registers it again with the served object
+CoordinatorManager.register('coordinator')
+
+
+class SharedRateLimiter:
+    """Worker side of the coordinator's per-host rate limit, with a local limiter while it is unreachable"""
+
+    def __init__(self, worker, fallback):
+        self.worker = worker
+        self.fallback = fallback
+        self.acquired = 0
+        self.lock = threading.Lock()
+
+    def configure(self, requests_per_minute, burst):
+        """Retune the local fallback; the shared limit follows the coordinator's config"""
+        self.fallback.configure(requests_per_minute, burst)
+
+    def acquire(self, url):
+        """Reserve one request slot from the coordinator, sleeping until it is due"""
+        with self.lock:
+            self.acquired += 1
+        try:
+            wait = self.worker.call('reserve', url)
+        except CONNECTION_ERRORS:
+            wait = self.fallback.reserve(url)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class ShardWorker(PopmartMonitor):
+    """Monitor that checks the shard of products the coordinator assigns to it"""
+
+    def __init__(self, config_file, address, authkey, worker_id, metrics_port=None):
+        self.address = address
+        self.authkey = authkey
+        self.worker_id = worker_id
+        self.metrics_port = metrics_port
+        self.coordinator = None
+        self.connect_lock = threading.Lock()
+        self.assignment_version = None
+        self.sync_thread = None
+        self.config = {}
+        super().__init__(config_file)
+        sharding_config = self.config.get('sharding', {})
+        self.heartbeat_interval = sharding_config.get('heartbeat_seconds', 5)
+        self.rate_limiter = SharedRateLimiter(self, self.rate_limiter)
+
+    def setup_logging(self):
+        """Setup logging with the worker id on every line"""
+        logging.basicConfig(
+            level=logging.INFO,
+            format=f'%(asctime)s - {self.worker_id} - %(levelname)s - %(message)s',
+            handlers=[
+                logging.FileHandler('popmart_monitor.log'),
+                logging.StreamHandler()
+            ]
+        )
+        self.logger = logging.getLogger(__name__)
+
+    def read_config(self):
+        """Read the shared config with a per-worker state file and the products the coordinator assigned"""
+        config = super().read_config()
+        monitoring_config = config.setdefault('monitoring', {})
+        suffix = re.sub(r'[^\w.-]', '_', self.worker_id)
+        monitoring_config['state_file'] = f"{monitoring_config.get('state_file', 'popmart_state.db')}.{suffix}"
+        if self.metrics_port is not None:
+            config.setdefault('metrics', {})['port'] = self.metrics_port
+        # The coordinator owns the product list; it rebalances shards itself when config.json changes
+        config['products'] = [product.to_config() for product in self.config.get('products', [])]
+        return config
+
+    def connect(self):
+        """Connect to the coordinator"""
+        with self.connect_lock:
+            if self.coordinator is None:
+                manager = CoordinatorManager(address=self.address, authkey=self.authkey)
+                manager.connect()
+                self.coordinator = manager.coordinator()
+            return self.coordinator
+
+    def call(self, method, *args):
+        """Call the coordinator, reconnecting once if the connection was lost"""
+        for attempt in range(2):
+            try:
+                coordinator = self.coordinator or self.connect()
+                return getattr(coordinator, method)(*args)
+            except CONNECTION_ERRORS:
+                self.coordinator = None
+                if attempt:
+                    raise
+
+    def sync_assignment(self):
+        """Heartbeat the coordinator and pick up a new shard when the assignment changed"""
+        try:
+            version = self.call('heartbeat', self.worker_id)
+            if version == self.assignment_version:
+                return
+            version, products, states = self.call('assignment', self.worker_id)
+        except CONNECTION_ERRORS as e:
+            self.logger.warning(f"Coordinator unreachable, keeping the current "
+                                f"{len(self.config.get('products', []))} products: {e}")
+            return
+        self.apply_assignment(version, products, states)
+
+    def apply_assignment(self, version, products, states):
+        """Switch to a new shard, taking over the last known state of products that moved here"""
+        current = {product.url for product in self.config.get('products', [])}
+        assigned = {product.url for product in products}
+
+        for url, state in states.items():
+            local = self.state_store.get(url)
+            if url not in current and (local is None or (local.last_seen or 0) < (state.last_seen or 0)):
+                # Another worker checked it last; its state keeps alerts edge-triggered across the move
+                self.state_store.adopt(state)
+                if state.last_seen:
+                    self.last_check_time[url] = state.last_seen
+
+        self.config['products'] = products
+        self.assignment_version = version
+        for url in current - assigned:
+            self.scheduler.remove(url)
+
+        self.allocate_budget()
+        now = time.time()
+        for product in products:
+            if product.url not in current:
+                self.schedule_product(product, now)
+
+        self.logger.info(f"🧩 Shard v{version}: {len(products)} products "
+                         f"(+{len(assigned - current)} -{len(current - assigned)})")
+
+    def run_sync(self):
+        """Heartbeat loop run in a background thread"""
+        while True:
+            self.sync_assignment()
+            if self.stop_event.wait(self.heartbeat_interval):
+                return
+
+    def record_check_result(self, product_config, product_info):
+        """Record a check and report the resulting state to the coordinator"""
+        result = super().record_check_result(product_config, product_info)
+        state = self.state_store.get(product_config.url)
+        if state:
+            try:
+                if self.call('report', self.worker_id, state) == 'rearm':
+                    self.state_store.rearm(product_config.url)
+            except CONNECTION_ERRORS as e:
+                self.logger.warning(f"Could not report {product_config.name} to the coordinator: {e}")
+        return result
+
+    def send_stock_notification(self, product_info, product_config):
+        """Let the coordinator send the restock alert so workers never announce the same restock twice"""
+        try:
+            with self.metrics.time('popmart_stage_seconds', stage='notify'):
+                sent = self.call('notify_restock', self.worker_id, product_config.url, product_info)
+        except CONNECTION_ERRORS as e:
+            self.logger.warning(f"Coordinator unreachable, sending the alert directly: {e}")
+            return super().send_stock_notification(product_info, product_config)
+        self.metrics.inc('popmart_notifications_total', outcome='queued' if sent else 'failed')
+        return sent
+
+    def send_embed(self, embed, on_failure=None):
+        """Queue a notification on the coordinator's dispatcher, or locally while it is unreachable"""
+        try:
+            return self.call('notify', self.worker_id, embed)
+        except CONNECTION_ERRORS:
+            return super().send_embed(embed, on_failure)
+
+    def cleanup(self):
+        """Leave the ring so the shard moves immediately, then release resources"""
+        # Stop heartbeating first, or the next heartbeat would rejoin the ring
+        self.stop_event.set()
+        if self.sync_thread:
+            self.sync_thread.join(timeout=10)
+        try:
+            self.call('unregister', self.worker_id)
+        except CONNECTION_ERRORS:
+            pass
+        super().cleanup()
+
+    def run_monitor(self):
+        """Keep the shard in sync with the coordinator while monitoring it"""
+        self.sync_thread = threading.Thread(target=self.run_sync, name='shard-sync', daemon=True)
+        self.sync_thread.start()
+        super().run_monitor()
+
+
+def parse_address(value):
+    """(host, port) from HOST:PORT"""
+    host, _, port = value.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+def run_worker(config_file, address, authkey, worker_id, metrics_port=None):
+    """Entry point of a worker process"""
+    ShardWorker(config_file, address, authkey, worker_id, metrics_port).run_monitor()
+
+
+def start_worker(config_file, address, authkey, worker_id, metrics_port):
+    """Start a local worker in a spawned process"""
+    process = multiprocessing.get_context('spawn').Process(
+        target=run_worker, args=(config_file, address, authkey, worker_id, metrics_port), name=worker_id
+    )
+    process.start()
+    return process
+
+
+def config_signature(config_file):
+    """Modification time and size of the config file, or None if it cannot be read"""
+    try:
+        stat = os.stat(config_file)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def reload_coordinator_config(config_file, coordinator, dispatcher, logger):
+    """Apply products, webhook and shared rate limit from a changed config file; invalid files are ignored"""
+    try:
+        with open(config_file, 'r') as f:
+            config = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.error(f"⚙️ Config reload skipped, could not read {config_file}: {e}")
+        return False
+    errors = validate_config(config)
+    if errors:
+        logger.error(f"⚙️ Config reload skipped, {config_file} is invalid: {'; '.join(errors)}")
+        return False
+
+    monitoring_config = config.get('monitoring', {})
+    dispatcher.webhook_url = config.get('discord_webhook_url')
+    coordinator.rate_limiter.configure(monitoring_config.get('requests_per_minute_per_host', 30),
+                                       max(int(monitoring_config.get('max_concurrent_checks', 5)), 1))
+    coordinator.update_products(load_products(config.get('products', [])))
+    # Workers reload their own check settings; sharding settings still need a restart
+    logger.info(f"⚙️ Config reloaded: {len(coordinator.products)} products")
+    return True
+
+
+def run_coordinator(config_file, address, authkey, workers):
+    """Serve the coordinator and supervise the local workers until interrupted"""
+    logger = logging.getLogger(__name__)
+    with open(config_file, 'r') as f:
+        config = json.load(f)
+
+    monitoring_config = config.get('monitoring', {})
+    sharding_config = config.get('sharding', {})
+    notifications_config = config.get('notifications', {})
+    heartbeat_interval = sharding_config.get('heartbeat_seconds', 5)
+
+    dispatcher = DiscordDispatcher(
+        config.get('discord_webhook_url'),
+        logger,
+        max_queue=notifications_config.get('max_queue', 1000),
+        batch_window=notifications_config.get('batch_window_seconds', 1.0)
+    )
+    dispatcher.start()
+    state_store = ProductStateStore(sharding_config.get('state_file', 'popmart_coordinator.db'))
+    coordinator = ShardCoordinator(
+        load_products(config.get('products', [])),
+        state_store,
+        HostRateLimiter(monitoring_config.get('requests_per_minute_per_host', 30),
+                        burst=max(int(monitoring_config.get('max_concurrent_checks', 5)), 1)),
+        dispatcher,
+        logger,
+        heartbeat_timeout=sharding_config.get('heartbeat_timeout_seconds', 20),
+        replicas=sharding_config.get('ring_replicas', 100)
+    )
+
+    CoordinatorManager.register('coordinator', callable=lambda: coordinator)
+    server = CoordinatorManager(address=address, authkey=authkey).get_server()
+    threading.Thread(target=server.serve_forever, name='coordinator', daemon=True).start()
+    logger.info(f"🧭 Coordinator for {len(coordinator.products)} products listening on "
+                f"{address[0]}:{address[1]}, starting {workers} local workers")
+
+    metrics_port = config.get('metrics', {}).get('port', 9108)
+    hostname = socket.gethostname()
+    processes = {}
+    for index in range(workers):
+        worker_id = f"{hostname}-{index}"
+        processes[worker_id] = (index, start_worker(config_file, address, authkey, worker_id,
+                                                    metrics_port + 1 + index))
+
+    status_due = time.monotonic() + 60
+    signature = config_signature(config_file)
+    try:
+        while True:
+            time.sleep(heartbeat_interval)
+            current = config_signature(config_file)
+            if current is not None and current != signature:
+                signature = current
+                reload_coordinator_config(config_file, coordinator, dispatcher, logger)
+
+            for worker_id, (index, process) in list(processes.items()):
+                if process.is_alive():
+                    continue
+                # No need to wait for the heartbeat timeout when a local worker visibly died
+                coordinator.unregister(worker_id, f"exited with code {process.exitcode}")
+                if sharding_config.get('restart_workers', True):
+                    processes[worker_id] = (index, start_worker(config_file, address, authkey, worker_id,
+                                                                metrics_port + 1 + index))
+                else:
+                    del processes[worker_id]
+            coordinator.reap()
+
+            if time.monotonic() >= status_due:
+                status_due = time.monotonic() + 60
+                status = coordinator.status()
+                logger.info(f"🧭 Shards v{status['version']}: {status['shards']}, "
+                            f"restocks {status['restocks']}, duplicates suppressed {status['duplicates']}, "
+                            f"reports {status['reports']} ({status['stale_reports']} stale)")
+    except KeyboardInterrupt:
+        logger.info("Coordinator stopped by user")
+    finally:
+        for _, process in processes.values():
+            process.join(timeout=15)
+            if process.is_alive():
+                process.terminate()
+        server.stop_event.set()
+        dispatcher.stop()
+        state_store.close()
+
+
+def main():
+    """Run the coordinator with local workers, or a single worker joining a remote coordinator"""
+    parser = argparse.ArgumentParser(description="Sharded Popmart Monitor")
+    parser.add_argument('--config', default='config.json')
+    parser.add_argument('--workers', type=int, help="Local worker processes (default: sharding.workers)")
+    parser.add_argument('--bind', help="Coordinator HOST:PORT (default: sharding.bind)")
+    parser.add_argument('--connect', metavar='HOST:PORT', help="Run one worker for the coordinator at this address")
+    parser.add_argument('--worker-id', help="Worker name when joining with --connect (default: HOST-PID)")
+    parser.add_argument('--metrics-port', type=int, help="Metrics port of a worker started with --connect")
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as f:
+        sharding_config = json.load(f).get('sharding', {})
+    authkey = os.environ.get('POPMART_SHARD_AUTHKEY') or sharding_config.get('authkey')
+
+    if args.connect:
+        if not authkey:
+            parser.error("joining a coordinator needs sharding.authkey or POPMART_SHARD_AUTHKEY")
+        worker_id = args.worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        run_worker(args.config, parse_address(args.connect), authkey.encode('utf-8'), worker_id, args.metrics_port)
+        return
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - coordinator - %(levelname)s - %(message)s')
+    # Without a configured key only the local workers, which are handed this one, can connect
+    authkey = authkey.encode('utf-8') if authkey else secrets.token_bytes(32)
+    workers = args.workers if args.workers is not None else sharding_config.get('workers', 2)
+    run_coordinator(args.config, parse_address(args.bind or sharding_config.get('bind', '127.0.0.1:9200')),
+                    authkey, workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Load Test for Popmart Monitor
+Runs the monitor against the mock storefront and mock webhook at growing product counts and
+concurrency, and reports cycle time, restock detection latency and resource use
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import re
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+import mock_storefront
+import mock_webhook
+
+NOTIFICATION_PATTERN = re.compile(r'\*\*Mock Product (\d+)\*\*')
+
+
+def percentile(values, share):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * share), len(ordered) - 1)]
+
+
+def build_config(storefront_port, webhook_port, products, concurrency, args):
+    """Monitor config pointing every product at the mock storefront"""
+    return {
+        'discord_webhook_url': f"http://127.0.0.1:{webhook_port}/api/webhooks/mock",
+        'products': [
+            {'name': f"Mock Product {i}",
+             'url': f"http://127.0.0.1:{storefront_port}/us/products/{i}/MOCK-PRODUCT-{i}"}
+            for i in range(products)
+        ],
+        'monitoring': {
+            'check_interval_minutes': args.check_interval,
+            'random_delay': False,
+            'human_behavior': False,
+            'max_concurrent_checks': concurrency,
+            'requests_per_minute_per_host': args.rpm,
+            'max_connections_per_host': concurrency,
+        },
+        'cloudflare': {
+            'max_retries': 1,
+            'retry_delay': 0,
+            'use_selenium_fallback': False
+        },
+        'notifications': {
+            'max_queue': products * 4,
+            'batch_window_seconds': 0.5
+        },
+        'selenium': {'prewarm': False},
+        'parsing': {'process_pool': args.parse_pool},
+        'listings': {
+            'urls': [f"http://127.0.0.1:{storefront_port}/us/collection/{page}"
+                     for page in range(-(-products // args.listing_size))] if args.listing_size else []
+        }
+    }
+
+
+def run_case(config, duration):
+    """Run the monitor for the given time in this (child) process and report what it cost"""
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    from bot import PopmartMonitor
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # Every case starts without stored state, so the first check of each product is a cold one
+        config['monitoring']['state_file'] = os.path.join(workdir, 'state.db')
+        config_file = os.path.join(workdir, 'config.json')
+        with open(config_file, 'w') as f:
+            json.dump(config, f)
+
+        monitor = PopmartMonitor(config_file)
+        cycles = []
+        monitor_products = monitor.monitor_products
+
+        def timed_monitor_products(products=None):
+            started = time.monotonic()
+            monitor_products(products)
+            cycles.append((len(products or []), time.monotonic() - started))
+
+        monitor.monitor_products = timed_monitor_products
+
+        peak_threads = [threading.active_count()]
+        stop_sampling = threading.Event()
+
+        def sample_threads():
+            while not stop_sampling.wait(0.5):
+                peak_threads[0] = max(peak_threads[0], threading.active_count())
+
+        threading.Thread(target=sample_threads, daemon=True).start()
+        threading.Timer(duration, monitor.stop).start()
+
+        cpu_start = os.times()
+        started = time.monotonic()
+        monitor.run_monitor()
+        elapsed = time.monotonic() - started
+        cpu_end = os.times()
+        stop_sampling.set()
+
+    # Children covers parse worker processes, which have exited by the time cleanup returns
+    cpu = (cpu_end.user - cpu_start.user + cpu_end.system - cpu_start.system
+           + cpu_end.children_user - cpu_start.children_user
+           + cpu_end.children_system - cpu_start.children_system)
+    return {
+        'elapsed': elapsed,
+        'cycles': cycles,
+        'cpu_seconds': cpu,
+        'peak_rss_mib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 if resource else 0.0,
+        'peak_threads': peak_threads[0],
+    }
+
+
+def detection_latencies(received, schedule, window_start):
+    """Seconds from each restock to its notification; restocks before the run count as initial"""
+    latencies = []
+    initial = 0
+    for arrived, embed in received:
+        match = NOTIFICATION_PATTERN.search(embed.get('description', ''))
+        if not match:
+            continue
+        restocked = schedule.restocked_at(int(match.group(1)), arrived)
+        if restocked is None or restocked < window_start:
+            # Already in stock when monitoring began, or out of stock again before delivery
+            initial += 1
+            continue
+        latencies.append(arrived - restocked)
+    return latencies, initial
+
+
+def run_load_test(products, concurrency, args):
+    """One load-test case: fresh servers, monitor in a child process, metrics from both sides"""
+    storefront, storefront_state = mock_storefront.start_server(
+        products=products, latency=args.latency, latency_jitter=args.latency_jitter,
+        forbidden_rate=args.forbidden_rate, challenge_rate=args.challenge_rate,
+        login_rate=args.login_rate, flip_interval=args.flip_interval, page_kib=args.page_kib,
+        listing_size=args.listing_size or 50
+    )
+    webhook, webhook_state = mock_webhook.start_server(rate_limit=0)
+    config = build_config(storefront.server_address[1], webhook.server_address[1],
+                          products, concurrency, args)
+
+    window_start = time.time()
+    # A fresh spawned process per case keeps peak RSS and CPU time specific to this case
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+        result = executor.submit(run_case, config, args.duration).result()
+    window_end = time.time()
+
+    storefront.shutdown()
+    webhook.shutdown()
+
+    latencies, initial = detection_latencies(webhook_state.received, storefront_state.schedule, window_start)
+    restocks = sum(storefront_state.schedule.restocks_between(i, window_start, window_end)
+                   for i in range(products))
+    checks = sum(size for size, _ in result['cycles'])
+    cycle_times = [seconds for _, seconds in result['cycles']]
+    stats = storefront_state.stats()
+
+    return {
+        'products': products,
+        'concurrency': concurrency,
+        'elapsed': result['elapsed'],
+        'checks': checks,
+        'checks_per_second': checks / result['elapsed'] if result['elapsed'] else 0.0,
+        'cycles': len(cycle_times),
+        'cycle_mean': statistics.mean(cycle_times) if cycle_times else 0.0,
+        'cycle_max': max(cycle_times, default=0.0),
+        'detected': len(latencies),
+        'restocks': restocks,
+        'initial_alerts': initial,
+        'latency_p50': percentile(latencies, 0.5),
+        'latency_p95': percentile(latencies, 0.95),
+        'latency_max': max(latencies, default=0.0),
+        'requests': stats['requests'],
+        'not_modified': stats['not_modified'],
+        'forbidden': stats['statuses'].get(403, 0),
+        'cpu_seconds': result['cpu_seconds'],
+        'cpu_percent': result['cpu_seconds'] / result['elapsed'] * 100 if result['elapsed'] else 0.0,
+        'peak_rss_mib': result['peak_rss_mib'],
+        'peak_threads': result['peak_threads'],
+    }
+
+
+def print_report(results):
+    """Print one row per load-test case"""
+    print()
+    print("📈 LOAD TEST RESULTS")
+    print("=" * 118)
+    print(f"{'products':>8}{'conc':>6}{'checks':>8}{'chk/s':>8}{'cycle avg':>11}{'cycle max':>11}"
+          f"{'detected':>10}{'lat p50':>9}{'lat p95':>9}{'requests':>10}{'304s':>7}{'403s':>6}"
+          f"{'CPU %':>7}{'RSS MiB':>9}{'threads':>9}")
+    print("-" * 118)
+    for r in results:
+        print(f"{r['products']:>8}{r['concurrency']:>6}{r['checks']:>8}{r['checks_per_second']:>8.1f}"
+              f"{r['cycle_mean']:>10.1f}s{r['cycle_max']:>10.1f}s"
+              f"{str(r['detected']) + '/' + str(r['restocks']):>10}"
+              f"{r['latency_p50']:>8.1f}s{r['latency_p95']:>8.1f}s{r['requests']:>10}{r['not_modified']:>7}"
+              f"{r['forbidden']:>6}{r['cpu_percent']:>7.0f}{r['peak_rss_mib']:>9.0f}{r['peak_threads']:>9}")
+
+
+def main():
+    """Run every product count and concurrency combination"""
+    parser = argparse.ArgumentParser(description="Load test Popmart Monitor against a mock storefront")
+    parser.add_argument('--products', default='100,500,1000', help="Comma-separated product counts")
+    parser.add_argument('--concurrency', default='5,20', help="Comma-separated max_concurrent_checks values")
+    parser.add_argument('--duration', type=float, default=120.0, help="Seconds to run each case")
+    parser.add_argument('--check-interval', type=float, default=0.5, help="check_interval_minutes")
+    parser.add_argument('--rpm', type=float, default=100000, help="requests_per_minute_per_host")
+    parser.add_argument('--flip-interval', type=float, default=60.0, help="Seconds between stock flips")
+    parser.add_argument('--latency', type=float, default=0.05, help="Storefront response latency in seconds")
+    parser.add_argument('--latency-jitter', type=float, default=0.02)
+    parser.add_argument('--forbidden-rate', type=float, default=0.01)
+    parser.add_argument('--challenge-rate', type=float, default=0.01)
+    parser.add_argument('--login-rate', type=float, default=0.0)
+    parser.add_argument('--page-kib', type=int, default=64)
+    parser.add_argument('--parse-pool', action='store_true', help="Parse pages in the process pool")
+    parser.add_argument('--listing-size', type=int, default=0,
+                        help="Check products through collection pages of this many products (0 = product pages only)")
+    parser.add_argument('--save', metavar='FILE', help="Write results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    for products in (int(value) for value in args.products.split(',')):
+        for concurrency in (int(value) for value in args.concurrency.split(',')):
+            print(f"🚀 {products} products, concurrency {concurrency}, {args.duration:.0f}s...")
+            results.append(run_load_test(products, concurrency, args))
+
+    print_report(results)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Mock Popmart Storefront for Popmart Monitor
+Local product and listing pages for thousands of synthetic products with injected latency,
+403s, challenge and login pages, and stock that flips on a fixed schedule
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks', 'fixtures')
+PRODUCT_PATH_PATTERN = re.compile(r'^/us/products/(\d+)(?:/[^?]*)?$')
+LISTING_PATH_PATTERN = re.compile(r'^/us/collection/(\d+)$')
+
+
+def load_fixture(name):
+    """Read one of the saved benchmark pages"""
+    with open(os.path.join(FIXTURES_DIR, name), 'rb') as f:
+        return f.read()
+
+
+class StockSchedule:
+    """Deterministic stock flips: each product is out of stock for one interval, then in stock for one"""
+
+    def __init__(self, products, flip_interval, seed, started=None):
+        self.flip_interval = flip_interval
+        self.started = started or time.time()
+        rng = random.Random(seed)
+        # Each product starts somewhere in its flip cycle so flips are spread over time
+        self.phases = [rng.uniform(0, 2 * flip_interval) for _ in range(products)]
+
+    def elapsed(self, product_id, now):
+        """Position of the product in its flip cycle"""
+        return now - self.started + self.phases[product_id]
+
+    def in_stock(self, product_id, now=None):
+        """Stock state of the product at the given time"""
+        return int(self.elapsed(product_id, now or time.time()) // self.flip_interval) % 2 == 1
+
+    def restocked_at(self, product_id, now=None):
+        """Time the product most recently went into stock, or None if it is out of stock"""
+        now = now or time.time()
+        if not self.in_stock(product_id, now):
+            return None
+        return now - (self.elapsed(product_id, now) % self.flip_interval)
+
+    def restocks_between(self, product_id, start, end):
+        """Number of out-of-stock to in-stock flips in the time window"""
+        period = 2 * self.flip_interval
+        first = self.started - self.phases[product_id] + self.flip_interval
+
+        def flips_before(moment):
+            return max(int((moment - first) // period) + 1, 0)
+
+        return flips_before(end) - flips_before(start)
+
+
+class MockStorefrontState:
+    """Catalogue, stock schedule, fault injection settings and counters shared by handler threads"""
+
+    def __init__(self, products=1000, latency=0.0, latency_jitter=0.0, forbidden_rate=0.0,
+                 challenge_rate=0.0, login_rate=0.0, flip_interval=60.0, page_kib=64, listing_size=50,
+                 seed=1584):
+        self.products = products
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.forbidden_rate = forbidden_rate
+        self.challenge_rate = challenge_rate
+        self.login_rate = login_rate
+        self.page_kib = page_kib
+        self.listing_size = listing_size
+        self.schedule = StockSchedule(products, flip_interval, seed)
+        self.random = random.Random(seed)
+
+        self.challenge_page = load_fixture('challenge.html')
+        self.login_page = load_fixture('login.html')
+        self.forbidden_page = load_fixture('forbidden_403.html')
+        self.padding = self.render_padding()
+
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.not_modified = 0
+        self.bytes_sent = 0
+        self.statuses = {}
+        self.injected = {'forbidden': 0, 'challenge': 0, 'login': 0}
+
+    def url(self, product_id, host='127.0.0.1', port=8098):
+        """Product page URL for a synthetic product"""
+        return f"http://{host}:{port}/us/products/{product_id}/MOCK-PRODUCT-{product_id}"
+
+    def listing_url(self, page, host='127.0.0.1', port=8098):
+        """Collection page URL showing listing_size products starting at page * listing_size"""
+        return f"http://{host}:{port}/us/collection/{page}"
+
+    def listing_pages(self):
+        """Number of collection pages that together show every product"""
+        return -(-self.products // self.listing_size)
+
+    def name(self, product_id):
+        """Display name of a synthetic product"""
+        return f"Mock Product {product_id}"
+
+    def inject(self):
+        """Pick a fault for this request: 'forbidden', 'challenge', 'login' or None"""
+        with self.lock:
+            roll = self.random.random()
+            for fault, rate in (('forbidden', self.forbidden_rate), ('challenge', self.challenge_rate),
+                                ('login', self.login_rate)):
+                if roll < rate:
+                    self.injected[fault] += 1
+                    return fault
+                roll -= rate
+            return None
+
+    def delay(self):
+        """Injected response latency in seconds"""
+        if not self.latency_jitter:
+            return self.latency
+        with self.lock:
+            return max(self.latency + self.random.uniform(-self.latency_jitter, self.latency_jitter), 0.0)
+
+    def render_padding(self):
+        """Recommendation cards that bring a product page up to roughly page_kib"""
+        card = ('<div class="index_productCard__u5Jbo"><a href="/us/products/{0}/related-{0}">'
+                '<div class="index_cardImage__yW3Pd"><img alt="product" loading="lazy" '
+                'src="https://prod-eurasian-res.popmart.com/default/rec_{0}.jpg"/></div>'
+                '<div class="index_cardTitle__B1xk0">THE MONSTERS Collection Figure {0}</div>'
+                '<div class="index_cardPrice__Vq9Fe">$19.99</div></a></div>')
+        cards = []
+        size = 0
+        while size < self.page_kib * 1024:
+            cards.append(card.format(len(cards)))
+            size += len(cards[-1])
+        return ''.join(cards)
+
+    def render_product(self, product_id, in_stock):
+        """Product page in the shape of a Popmart product page, with matching __NEXT_DATA__"""
+        name = self.name(product_id)
+        image = f"https://prod-eurasian-res.popmart.com/default/mock_{product_id}_800x800.jpg"
+        button = ('<div class="index_red__kx6Ql index_btn__w5L3R">ADD TO BAG</div>' if in_stock else
+                  '<div class="index_black__RgEgP index_renderbtn__iGhhU">NOTIFY ME WHEN AVAILABLE</div>')
+        data = {'props': {'pageProps': {'productData': {
+            'id': product_id, 'title': name, 'currency': 'USD', 'bannerImages': [image],
+            'skus': [{'id': product_id * 10, 'price': 2199, 'stock': {'onlineStock': 12 if in_stock else 0}}]
+        }}}}
+        return (
+            f'<!DOCTYPE html><html lang="en"><head><meta charSet="utf-8"/><title>{name} | POP MART</title></head>'
+            '<body><div id="__next"><main class="index_main__Qx2Tn"><div class="index_productDetail__Ub5xN">'
+            f'<div class="index_gallery__Z8cRk"><img alt="POP MART" src="{image}"/></div>'
+            f'<div class="index_info__Pm4aV"><h1 class="index_title__jgc2z">{name}</h1>'
+            '<div class="index_price__cAj0h">$21.99</div>'
+            f'<div class="index_actionContainer__EqFYe">{button}</div></div></div>'
+            f'<section class="index_recommend__wT3Jq">{self.padding}</section></main></div>'
+            f'<script id="__NEXT_DATA__" type="application/json">{json.dumps(data)}</script>'
+            '</body></html>'
+        ).encode('utf-8')
+
+    def render_listing(self, page, now=None):
+        """Collection page of product cards with stock badges, with matching __NEXT_DATA__"""
+        now = now or time.time()
+        first = page * self.listing_size
+        product_ids = range(first, min(first + self.listing_size, self.products))
+        cards = []
+        items = []
+        for product_id in product_ids:
+            in_stock = self.schedule.in_stock(product_id, now)
+            name = self.name(product_id)
+            badge = '' if in_stock else '<div class="index_soldOut__Pf3Kx">SOLD OUT</div>'
+            cards.append(
+                f'<div class="index_productCard__u5Jbo"><a href="/us/products/{product_id}/MOCK-PRODUCT-{product_id}">'
+                f'<div class="index_cardImage__yW3Pd"><img alt="product" loading="lazy" '
+                f'src="https://prod-eurasian-res.popmart.com/default/mock_{product_id}_800x800.jpg"/>{badge}</div>'
+                f'<div class="index_cardTitle__B1xk0">{name}</div>'
+                '<div class="index_cardPrice__Vq9Fe">$21.99</div></a></div>'
+            )
+            items.append({'id': product_id, 'title': name, 'currency': 'USD',
+                          'skus': [{'id': product_id * 10, 'price': 2199,
+                                    'stock': {'onlineStock': 12 if in_stock else 0}}]})
+        data = {'props': {'pageProps': {'productList': items, 'page': page}}}
+        return (
+            '<!DOCTYPE html><html lang="en"><head><meta charSet="utf-8"/><title>Collection | POP MART</title></head>'
+            '<body><div id="__next"><main class="index_main__Qx2Tn"><div class="index_productList__Tn0Ab">'
+            f'{"".join(cards)}</div></main></div>'
+            f'<script id="__NEXT_DATA__" type="application/json">{json.dumps(data)}</script>'
+            '</body></html>'
+        ).encode('utf-8')
+
+    def count(self, status, size):
+        """Record one response"""
+        with self.lock:
+            self.requests += 1
+            self.bytes_sent += size
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            if status == 304:
+                self.not_modified += 1
+
+    def stats(self):
+        """Snapshot of the counters"""
+        with self.lock:
+            return {
+                'requests': self.requests,
+                'not_modified': self.not_modified,
+                'bytes_sent': self.bytes_sent,
+                'statuses': dict(self.statuses),
+                'injected': dict(self.injected),
+            }
+
+
+class MockStorefrontHandler(BaseHTTPRequestHandler):
+    """Serves product and listing pages, injected faults and 304s for unchanged stock state"""
+
+    protocol_version = 'HTTP/1.1'
+    state = None
+
+    def handle(self):
+        try:
+            super().handle()
+        except ConnectionError:
+            # Streaming checks hang up as soon as a page is decisively out of stock
+            pass
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+        match = PRODUCT_PATH_PATTERN.match(path)
+        product_id = int(match.group(1)) if match else -1
+        listing = LISTING_PATH_PATTERN.match(path)
+        page = int(listing.group(1)) if listing else -1
+
+        delay = self.state.delay()
+        if delay:
+            time.sleep(delay)
+
+        if not (0 <= product_id < self.state.products or 0 <= page < self.state.listing_pages()):
+            self.respond(404, b'<html><body>Not found</body></html>')
+            return
+
+        fault = self.state.inject()
+        if fault == 'forbidden':
+            self.respond(403, self.state.forbidden_page)
+            return
+        if fault == 'challenge':
+            self.respond(200, self.state.challenge_page)
+            return
+        if fault == 'login':
+            self.respond(200, self.state.login_page)
+            return
+
+        if listing:
+            self.respond(200, self.state.render_listing(page))
+            return
+
+        in_stock = self.state.schedule.in_stock(product_id)
+        etag = f'"{product_id}-{int(in_stock)}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.respond(304, b'', etag)
+            return
+        self.respond(200, self.state.render_product(product_id, in_stock), etag)
+
+    def respond(self, status, body, etag=None):
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        if etag:
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+        self.state.count(status, len(body))
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(host='127.0.0.1', port=0, **options):
+    """Start the mock storefront in a background thread and return (server, state)"""
+    state = MockStorefrontState(**options)
+    handler = type('BoundMockStorefrontHandler', (MockStorefrontHandler,), {'state': state})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='mock-storefront', daemon=True).start()
+    return server, state
+
+
+def main():
+    """Serve the mock storefront until interrupted"""
+    parser = argparse.ArgumentParser(description="Mock Popmart storefront for Popmart Monitor")
+    parser.add_argument('--port', type=int, default=8098)
+    parser.add_argument('--products', type=int, default=1000)
+    parser.add_argument('--latency', type=float, default=0.0, help="Added response latency in seconds")
+    parser.add_argument('--latency-jitter', type=float, default=0.0)
+    parser.add_argument('--forbidden-rate', type=float, default=0.0, help="Share of requests answered 403")
+    parser.add_argument('--challenge-rate', type=float, default=0.0, help="Share answered with a challenge page")
+    parser.add_argument('--login-rate', type=float, default=0.0, help="Share answered with a login page")
+    parser.add_argument('--flip-interval', type=float, default=60.0, help="Seconds between stock flips")
+    parser.add_argument('--page-kib', type=int, default=64)
+    parser.add_argument('--listing-size', type=int, default=50, help="Products shown per collection page")
+    args = parser.parse_args()
+
+    server, state = start_server(
+        port=args.port, products=args.products, latency=args.latency, latency_jitter=args.latency_jitter,
+        forbidden_rate=args.forbidden_rate, challenge_rate=args.challenge_rate, login_rate=args.login_rate,
+        flip_interval=args.flip_interval, page_kib=args.page_kib, listing_size=args.listing_size
+    )
+    print(f"🏪 Mock storefront with {args.products} products on {state.url(0, port=args.port)}, "
+          f"{state.listing_pages()} collection pages from {state.listing_url(0, port=args.port)}")
+    try:
+        while True:
+            time.sleep(10)
+            stats = state.stats()
+            print(f"   requests: {stats['requests']}, 304s: {stats['not_modified']}, "
+                  f"statuses: {stats['statuses']}, injected: {stats['injected']}")
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Mock Discord Webhook Server for Popmart Monitor
+Local stand-in webhook with rate limiting, plus a dispatcher throughput benchmark
+"""
+
+import argparse
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockWebhookState:
+    """Counters and the fixed-window rate limit shared by all handler threads"""
+
+    def __init__(self, rate_limit=5, window=2.0, latency=0.0):
+        self.rate_limit = rate_limit
+        self.window = window
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.window_start = time.monotonic()
+        self.window_count = 0
+        self.requests = 0
+        self.embeds = 0
+        self.rate_limited = 0
+        self.received = []
+
+    def admit(self):
+        """Return 0 if the request is allowed, otherwise the seconds until the window resets"""
+        with self.lock:
+            now = time.monotonic()
+            if now - self.window_start >= self.window:
+                self.window_start = now
+                self.window_count = 0
+
+            if self.rate_limit and self.window_count >= self.rate_limit:
+                self.rate_limited += 1
+                return self.window - (now - self.window_start)
+
+            self.window_count += 1
+            return 0
+
+
+class MockWebhookHandler(BaseHTTPRequestHandler):
+    """Accepts Discord-style webhook POSTs and answers 204, 400 or 429"""
+
+    protocol_version = 'HTTP/1.1'
+    state = None
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+        if self.state.latency:
+            time.sleep(self.state.latency)
+
+        retry_after = self.state.admit()
+        if retry_after:
+            payload = json.dumps({'message': 'You are being rate limited.',
+                                  'retry_after': round(retry_after, 3), 'global': False}).encode()
+            self.send_response(429)
+            self.send_header('Retry-After', f"{retry_after:.3f}")
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+
+        try:
+            embeds = json.loads(body).get('embeds', [])
+        except ValueError:
+            self.send_response(400)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        now = time.time()
+        with self.state.lock:
+            self.state.requests += 1
+            self.state.embeds += len(embeds)
+            self.state.received.extend((now, embed) for embed in embeds)
+
+        self.send_response(204)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(host='127.0.0.1', port=0, rate_limit=5, window=2.0, latency=0.0):
+    """Start the mock webhook in a background thread and return (server, state)"""
+    state = MockWebhookState(rate_limit=rate_limit, window=window, latency=latency)
+    handler = type('BoundMockWebhookHandler', (MockWebhookHandler,), {'state': state})
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, name='mock-webhook', daemon=True).start()
+    return server, state
+
+
+def run_benchmark(count, rate_limit, window, latency, batch_window):
+    """Push notifications through DiscordDispatcher against the mock webhook and report throughput"""
+    from bot import DiscordDispatcher
+
+    server, state = start_server(rate_limit=rate_limit, window=window, latency=latency)
+    url = f"http://127.0.0.1:{server.server_address[1]}/api/webhooks/mock"
+    logger = logging.getLogger('mock_webhook')
+    logger.setLevel(logging.WARNING)
+
+    dispatcher = DiscordDispatcher(url, logger, max_queue=count + 1, batch_window=batch_window)
+    dispatcher.start()
+
+    start = time.monotonic()
+    for i in range(count):
+        dispatcher.submit({'title': f"Mock product {i}", 'description': 'is now available!', 'color': 0x00ff00})
+    dispatcher.stop(timeout=max(60, count))
+    elapsed = time.monotonic() - start
+
+    stats = dispatcher.stats()
+    server.shutdown()
+
+    print("📊 DISPATCHER BENCHMARK")
+    print("=" * 50)
+    print(f"Notifications:   {count}")
+    print(f"Delivered:       {state.embeds} in {state.requests} webhook calls")
+    print(f"Failed/dropped:  {stats['failed']}/{stats['dropped']}")
+    print(f"429 responses:   {state.rate_limited}")
+    print(f"Elapsed:         {elapsed:.2f}s ({state.embeds / elapsed:.1f} notifications/s)")
+    print(f"Send latency:    avg {stats['latency_avg'] * 1000:.1f}ms, p95 {stats['latency_p95'] * 1000:.1f}ms")
+
+
+def main():
+    """Serve the mock webhook or run the dispatcher benchmark"""
+    parser = argparse.ArgumentParser(description="Mock Discord webhook for Popmart Monitor")
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--rate-limit', type=int, default=5, help="Requests allowed per window (0 = unlimited)")
+    parser.add_argument('--window', type=float, default=2.0, help="Rate limit window in seconds")
+    parser.add_argument('--latency', type=float, default=0.0, help="Added response latency in seconds")
+    parser.add_argument('--bench', type=int, metavar='N', help="Send N notifications through the dispatcher")
+    parser.add_argument('--batch-window', type=float, default=0.2)
+    args = parser.parse_args()
+
+    if args.bench:
+        run_benchmark(args.bench, args.rate_limit, args.window, args.latency, args.batch_window)
+        return
+
+    server, state = start_server(port=args.port, rate_limit=args.rate_limit,
+                                 window=args.window, latency=args.latency)
+    print(f"🤖 Mock webhook listening on http://127.0.0.1:{args.port}/api/webhooks/mock")
+    try:
+        while True:
+            time.sleep(10)
+            print(f"   requests: {state.requests}, embeds: {state.embeds}, 429s: {state.rate_limited}")
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()